@@ -41,8 +41,18 @@ class CSVProcessor:
             "sample": df.head(self.sample_size).to_dict('records'),
             "statistics": self._calculate_statistics(df),
             "dataframe": df,  # Keep for analysis
+            "df_version": self.file_version(file_path),
             "noun_mapping": self._create_noun_mapping(df)
         }
+
+    def file_version(self, file_path: str) -> tuple:
+        """
+        Identify a CSV's contents by resolved path, modification time and size,
+        so downstream caches hit whenever the same file is loaded again
+        """
+        path = Path(file_path).resolve()
+        st = path.stat()
+        return (str(path), st.st_mtime_ns, st.st_size)
     
     async def _process_large_csv(self, file_path: str) -> Dict[str, Any]:
         """
@@ -102,6 +102,18 @@ class CSVToSQLiteImporter:
         cursor.execute("CREATE INDEX idx_qd_product ON quotedetail(productidname)")
         cursor.execute("CREATE INDEX idx_qd_amount ON quotedetail(extendedamount)")
         
+        # Per-customer revenue summary read by the top/bottom customer queries;
+        # keep in step with CUSTOMER_REVENUE_DDL in init_sample_database.py
+        cursor.execute("DROP TABLE IF EXISTS customer_revenue")
+        cursor.execute("""
+            CREATE TABLE customer_revenue AS
+            SELECT customeridname, SUM(totalamount) AS total_revenue, COUNT(*) AS n_orders
+            FROM salesorder
+            WHERE customeridname IS NOT NULL AND totalamount IS NOT NULL
+            GROUP BY customeridname
+        """)
+        cursor.execute("CREATE INDEX idx_customer_revenue_total ON customer_revenue(total_revenue DESC, customeridname)")
+        
         self.conn.commit()
         print("Indexes created successfully!")
     
@@ -7,6 +7,25 @@ import random
 from datetime import datetime, timedelta
 import os
 
+# Per-customer revenue summary, rebuilt whenever salesorder is (re)loaded, so
+# "top/bottom N customers" reads a few rows instead of aggregating every order
+CUSTOMER_REVENUE_DDL = (
+    "DROP TABLE IF EXISTS customer_revenue",
+    """
+    CREATE TABLE customer_revenue AS
+    SELECT customeridname, SUM(totalamount) AS total_revenue, COUNT(*) AS n_orders
+    FROM salesorder
+    WHERE customeridname IS NOT NULL AND totalamount IS NOT NULL
+    GROUP BY customeridname
+    """,
+    "CREATE INDEX idx_customer_revenue_total ON customer_revenue(total_revenue DESC, customeridname)",
+)
+
+def refresh_customer_revenue(conn: sqlite3.Connection):
+    """Rebuild the customer_revenue summary table from salesorder"""
+    for statement in CUSTOMER_REVENUE_DDL:
+        conn.execute(statement)
+
 def create_sample_database():
     """Create a sample database with representative data"""
     db_path = os.path.join(os.path.dirname(__file__), "database", "crm_analytics.db")
@@ -183,11 +202,15 @@ def create_sample_database():
     print("Creating indexes...")
     cursor.execute("CREATE INDEX idx_salesorder_customer ON salesorder(customeridname)")
     cursor.execute("CREATE INDEX idx_salesorder_date ON salesorder(createdon)")
+    cursor.execute("CREATE INDEX idx_salesorder_status ON salesorder(statuscode)")
     cursor.execute("CREATE INDEX idx_quote_customer ON quote(customeridname)")
     cursor.execute("CREATE INDEX idx_quote_date ON quote(createdon)")
     cursor.execute("CREATE INDEX idx_quotedetail_quote ON quotedetail(quoteid)")
     cursor.execute("CREATE INDEX idx_quotedetail_product ON quotedetail(productidname)")
     
+    print("Building customer revenue summary...")
+    refresh_customer_revenue(conn)
+    
     # Commit and close
     conn.commit()
     conn.close()
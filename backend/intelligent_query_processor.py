@@ -15,11 +15,63 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # Store last query result for context
 last_query_result = {}
 
+# Follow-ups that re-render the previous chart instead of running a new analysis
+CHART_CONVERSION_PHRASES = (
+    'pie chart for this', 'convert to pie', 'make it pie', 'show as pie', 'give me pie',
+    'bar chart for this', 'convert to bar', 'make it bar', 'show as bar',
+    'line chart for this', 'convert to line', 'make it line', 'show as line'
+)
+
+def is_chart_conversion(query: str) -> bool:
+    """True for follow-ups that convert the last chart (these read and update last_query_result)"""
+    query_lower = query.lower()
+    return any(phrase in query_lower for phrase in CHART_CONVERSION_PHRASES)
+
+def remember_query_result(result: Dict[str, Any]):
+    """Make result the context that the next chart conversion works from"""
+    global last_query_result
+    last_query_result = result.copy()
+
+# Column kinds (as reported by infer_dtype) whose values are already JSON-safe
+_JSON_SAFE_KINDS = frozenset({"string", "integer", "floating", "mixed-integer-float", "boolean", "empty"})
+
+def _to_json_safe(value):
+    """Convert a single non-null chart value to a JSON-safe equivalent"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def clean_visualization_data(records: list) -> list:
+    """
+    Make chart records JSON-safe column by column instead of cell by cell
+    """
+    if not records:
+        return records
+    
+    frame = pd.DataFrame(records, dtype=object)
+    for col in frame.columns:
+        kind = pd.api.types.infer_dtype(frame[col], skipna=True)
+        if kind in _JSON_SAFE_KINDS:
+            continue
+        if kind == "datetime":
+            stamps = pd.to_datetime(frame[col])
+            # Whole-second naive timestamps format in one call, same as isoformat()
+            if stamps.dt.tz is None and not (stamps.dt.microsecond.any() or stamps.dt.nanosecond.any()):
+                text = np.datetime_as_string(stamps.to_numpy(dtype="datetime64[s]"), unit="s")
+                frame[col] = pd.Series(text, index=frame.index, dtype=object).where(stamps.notna(), None)
+                continue
+        # Dates, periods and other objects fall back to a per-value pass
+        frame[col] = frame[col].map(_to_json_safe, na_action='ignore').astype(object)
+    
+    # NaN/NaT/NA become None; to_dict boxes NumPy scalars into Python ones
+    return frame.where(frame.notna(), None).to_dict('records')
+
 def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
     """
     Use OpenAI to intelligently process any natural language query about the data
     """
-    global last_query_result
     
     # Get data schema information
     schema_info = {
@@ -27,7 +79,7 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
         "dtypes": {col: str(dtype) for col, dtype in data.dtypes.items()},
         "shape": data.shape,
         "numeric_columns": data.select_dtypes(include=[np.number]).columns.tolist(),
-        "text_columns": data.select_dtypes(include=['object']).columns.tolist(),
+        "text_columns": data.select_dtypes(include=['object', 'string', 'category']).columns.tolist(),
         "sample_values": {}
     }
     
@@ -36,7 +88,8 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
         if col in data.columns:
             non_null = data[col].dropna()
             if len(non_null) > 0:
-                if data[col].dtype == 'object':
+                # Text may be object, categorical or (Arrow-backed) string dtype
+                if data[col].dtype == 'object' or isinstance(data[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
                     schema_info["sample_values"][col] = non_null.head(3).tolist()
                 elif pd.api.types.is_datetime64_any_dtype(data[col]):
                     # Handle datetime/timestamp columns
@@ -147,14 +200,10 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
     
     # Check if this is a chart conversion request
     query_lower = query.lower()
-    is_chart_conversion = any(phrase in query_lower for phrase in [
-        'pie chart for this', 'convert to pie', 'make it pie', 'show as pie', 'give me pie',
-        'bar chart for this', 'convert to bar', 'make it bar', 'show as bar',
-        'line chart for this', 'convert to line', 'make it line', 'show as line'
-    ])
+    chart_conversion = is_chart_conversion(query)
     
     # Handle chart conversion directly without calling OpenAI
-    if is_chart_conversion and last_query_result.get('visualization'):
+    if chart_conversion and last_query_result.get('visualization'):
         last_viz = last_query_result['visualization']
         
         # Determine requested chart type
@@ -182,7 +231,7 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
         return converted_result
     
     context_info = ""
-    if is_chart_conversion and not last_query_result.get('visualization'):
+    if chart_conversion and not last_query_result.get('visualization'):
         # No previous visualization to convert
         context_info = """\n    CONTEXT: User is asking for a chart conversion but there's no previous visualization.
     Generate a new visualization based on the query.
@@ -254,25 +303,7 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
                 if 'visualizations' in result:
                     for viz in result['visualizations']:
                         if 'data' in viz and viz['data']:
-                            cleaned_data = []
-                            for item in viz['data']:
-                                cleaned_item = {}
-                                for key, value in item.items():
-                                    # Convert non-serializable types to string
-                                    if hasattr(value, 'isoformat'):
-                                        cleaned_item[key] = value.isoformat()
-                                    elif pd.api.types.is_datetime64_any_dtype(type(value)):
-                                        cleaned_item[key] = str(value)
-                                    elif isinstance(value, (pd.Timestamp, pd.Period)):
-                                        cleaned_item[key] = str(value)
-                                    elif pd.isna(value):
-                                        cleaned_item[key] = None
-                                    elif not isinstance(value, (str, int, float, bool, type(None))):
-                                        cleaned_item[key] = str(value)
-                                    else:
-                                        cleaned_item[key] = value
-                                cleaned_data.append(cleaned_item)
-                            viz['data'] = cleaned_data
+                            viz['data'] = clean_visualization_data(viz['data'])
                 
                 # Generate intelligent recommendations based on the actual data
                 if 'answer' in result:
@@ -288,19 +319,21 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
                         result['recommendations'] = recommendations
                 
                 # Store for context in next query
-                last_query_result = result.copy()
+                remember_query_result(result)
                 return result
             else:
                 # Convert simple results to proper format
                 return {
                     'answer': str(result),
-                    'metrics': {}
+                    'metrics': {},
+                    'fallback': True
                 }
         else:
             # Fallback if no result variable
             return {
                 'answer': "Analysis completed but no specific result was generated.",
-                'code_executed': code[:500]
+                'code_executed': code[:500],
+                'fallback': True
             }
             
     except Exception as e:
@@ -319,7 +352,8 @@ def analyze_query_with_llm(query: str, data: pd.DataFrame) -> Dict[str, Any]:
                             'type': 'bar',
                             'title': 'Top Customers by Revenue',
                             'data': [{'name': str(c)[:40], 'value': float(v)} for c, v in top_customers.items()]
-                        }
+                        },
+                        'fallback': True
                     }
             
             # Generic response
@@ -486,5 +520,8 @@ Return ONLY 4 ultra-specific recommendations as a JSON array of strings, no othe
 def process_data_query(query: str, data: pd.DataFrame) -> Dict[str, Any]:
     """
     Main entry point for intelligent query processing
+    
+    Canned answers given in place of a real analysis (e.g. after an OpenAI or
+    generated-code error) carry 'fallback': True so callers don't cache them.
     """
     return analyze_query_with_llm(query, data)
\ No newline at end of file
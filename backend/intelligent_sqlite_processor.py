@@ -10,6 +10,7 @@ from openai import OpenAI
 import os
 from typing import Dict, Any, List
 import sqlite3
+import threading
 from datetime import datetime
 import time
 
@@ -25,6 +26,34 @@ print(f"[INFO] OpenAI client initialized with API key: ...{api_key[-4:] if api_k
 # SQLite database path
 DB_PATH = "database/crm_analytics.db"
 
+# Tuning applied to each long-lived connection: relaxed fsync (safe with WAL),
+# 1 GiB memory-mapped reads and a 64 MiB page cache
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=1073741824",
+    "PRAGMA cache_size=-65536",
+    # Sorts and GROUP BYs in generated queries spill to memory, not temp files
+    "PRAGMA temp_store=MEMORY",
+)
+
+# One connection per worker thread, kept open across requests
+_thread_state = threading.local()
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's shared connection, opening and tuning it on first use"""
+    conn = getattr(_thread_state, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            # Read-only volumes cannot switch journal mode; reads still work
+            print(f"[WARNING] Could not enable WAL mode: {e}")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _thread_state.conn = conn
+    return conn
+
 # Data dictionary mappings for salesorder table
 STATUS_CODE_MAPPING = {
     0: "New", 1: "In Progress", 2: "Pending", 3: "Complete", 4: "Partial",
@@ -89,6 +118,27 @@ QUOTE_SHIPPING_METHOD_MAPPING = {
     0: "Air", 1: "Road", 2: "Sea", 3: "Courier"
 }
 
+# Column kinds (as reported by infer_dtype) whose values are already JSON-safe
+_JSON_SAFE_KINDS = frozenset({"string", "integer", "floating", "mixed-integer-float", "boolean", "empty"})
+
+def _to_json_safe(value):
+    """Convert a single non-null cell to a JSON-safe equivalent"""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a query result into JSON-safe records, one column at a time"""
+    out = df.astype(object)
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        # Only columns holding timestamps or other objects need a per-value pass
+        if pd.api.types.infer_dtype(column, skipna=True) not in _JSON_SAFE_KINDS:
+            out.isetitem(i, column.map(_to_json_safe, na_action='ignore').astype(object))
+    return out.where(df.notna(), None).to_dict('records')
+
 def get_database_schema():
     """Get the database schema for the LLM context"""
     return """
@@ -434,8 +484,8 @@ Output Format:
                 print(f"[ERROR] Raw content: {raw_content[:500]}...")
                 raise ValueError(f"API did not return valid JSON: {e}")
         
-        # Connect to SQLite database
-        conn = sqlite3.connect(DB_PATH)
+        # Reuse this thread's SQLite connection
+        conn = get_connection()
         
         # Execute main query
         print(f"[MAIN QUERY] Executing: {result['sql_query']}")
@@ -458,18 +508,8 @@ Output Format:
                 viz_df = pd.read_sql_query(chart_sql, conn)
                 print(f"[CHART SQL] Got {len(viz_df)} rows for chart: {viz.get('title', 'Unknown')}")
                 
-                # Format data for frontend
-                chart_data = viz_df.to_dict('records')
-                
-                # Clean up data types
-                for item in chart_data:
-                    for key, value in item.items():
-                        if pd.isna(value):
-                            item[key] = None
-                        elif isinstance(value, (pd.Timestamp, datetime)):
-                            item[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-                        elif not isinstance(value, (str, int, float, bool, type(None))):
-                            item[key] = str(value)
+                # Format data for frontend with JSON-safe values
+                chart_data = frame_to_records(viz_df)
                 
                 visualizations.append({
                     'type': viz['type'],
@@ -484,8 +524,6 @@ Output Format:
                 # Continue with other visualizations instead of failing completely
                 continue
         
-        conn.close()
-        
         # Now that we have the actual data, ask the LLM to generate a proper answer
         text_summary = ""
         if len(main_df) > 0:
@@ -611,7 +649,7 @@ Output Format:
 def get_database_stats():
     """Get current database statistics"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         
         stats = {}
@@ -637,7 +675,6 @@ def get_database_stats():
             db_size_mb = os.path.getsize(DB_PATH) / (1024 * 1024)
             stats['database_size_mb'] = round(db_size_mb, 2)
         
-        conn.close()
         return stats
         
     except Exception as e:
@@ -648,11 +685,9 @@ def test_sqlite_connection():
     """Test SQLite connection and return status"""
     try:
         if os.path.exists(DB_PATH):
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
+            cursor = get_connection().cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
             tables = cursor.fetchall()
-            conn.close()
             
             stats = get_database_stats()
             return {
@@ -1,4 +1,5 @@
 from typing import Dict, Any, List
+import asyncio
 import pandas as pd
 import numpy as np
 from backend.agents.deep_agent_core import DataAnalystDeepAgent
@@ -6,8 +7,11 @@ from backend.agents.deep_agent_core import DataAnalystDeepAgent
 async def analyze_data(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Analyze data using Deep Agent and generate insights
+    
+    Runs in parallel with generate_visualizations, so only the keys this
+    node owns are returned as the state update.
     """
-    state["current_step"] = "analyzing_data"
+    update = {"current_step": "analyzing_data"}
     
     try:
         # Get data sample and query
@@ -26,13 +30,13 @@ async def analyze_data(state: Dict[str, Any]) -> Dict[str, Any]:
             "data_types": data_sample.get("dtypes", {})
         }
         
-        # Perform deep analysis
-        analysis_result = analyst.analyze(query, data_context)
+        # Perform deep analysis off the event loop so the sibling branch can run
+        analysis_result = await asyncio.to_thread(analyst.analyze, query, data_context)
         
         # Extract key metrics for dashboard
         metrics = _calculate_key_metrics(data_sample)
         
-        state["analysis_result"] = {
+        update["analysis_result"] = {
             "summary": analysis_result.get("summary", ""),
             "metrics": metrics,
             "insights": analysis_result.get("recommendations", []),
@@ -40,9 +44,9 @@ async def analyze_data(state: Dict[str, Any]) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        state["error"] = f"Analysis failed: {str(e)}"
+        update["error"] = f"Analysis failed: {str(e)}"
     
-    return state
+    return update
 
 def _calculate_key_metrics(data_sample: Dict) -> Dict[str, Any]:
     """
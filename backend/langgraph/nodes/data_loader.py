@@ -106,6 +106,8 @@ def _get_sample_data() -> Dict[str, Any]:
         "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
         "sample": df.head(100).to_dict('records'),
         "statistics": stats,
+        # No df_version: the sample is regenerated at random on every run, so
+        # there is nothing stable for downstream caches to key on
         "dataframe": df,
         "noun_mapping": noun_mapping
     }
\ No newline at end of file
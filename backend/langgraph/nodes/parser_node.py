@@ -1,105 +1,131 @@
-from typing import Dict, Any
+from typing import Dict, Any, Set, Tuple
 import re
 
+# Keyword tables, listed in the priority order the matching helpers apply
+_INTENT_KEYWORDS = (
+    ("visualize", ("show", "display", "visualize", "chart", "graph")),
+    ("calculate", ("calculate", "compute", "sum", "average", "mean")),
+    ("compare", ("compare", "versus", "vs", "between")),
+    ("analyze_trend", ("trend", "pattern", "forecast", "predict")),
+    ("top_n", ("top", "best", "highest", "largest")),
+    ("detect_anomaly", ("anomaly", "outlier", "unusual", "abnormal")),
+)
+
+_FOCUS_KEYWORDS = (
+    ("customer", ("customer",)),
+    ("product", ("product",)),
+    ("revenue", ("revenue",)),
+    ("order", ("order",)),
+)
+
+_METRIC_KEYWORDS = (
+    ("revenue", ("revenue", "sales", "income")),
+    ("quantity", ("quantity", "amount", "volume", "units")),
+    ("profit", ("profit", "margin", "earnings")),
+    ("cost", ("cost", "expense", "spending")),
+    ("count", ("count", "number", "total")),
+    ("average", ("average", "mean", "avg")),
+    ("sum", ("sum", "total", "aggregate")),
+)
+
+# keyword -> [(kind, (rank, tag)), ...]; one keyword may feed several tags and
+# the rank carries the table's priority order so no re-walk is needed later
+_KEYWORD_TAGS: Dict[str, list] = {}
+for _kind, _table in (("intent", _INTENT_KEYWORDS), ("focus", _FOCUS_KEYWORDS), ("metric", _METRIC_KEYWORDS)):
+    for _rank, (_tag, _words) in enumerate(_table):
+        for _word in _words:
+            _KEYWORD_TAGS.setdefault(_word, []).append((_kind, (_rank, _tag)))
+
+# Single alternation over every keyword, scanned once per query. The
+# zero-width lookahead reports overlapping hits so the result matches the
+# old per-keyword substring checks exactly.
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(re.escape(w) for w in sorted(_KEYWORD_TAGS, key=len, reverse=True)) + "))"
+)
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+# Date patterns in priority order; the first one that matches wins
+_DATE_RES = (
+    re.compile(r'\b\d{4}-\d{2}-\d{2}\b'),
+    re.compile(
+        r'\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b',
+        re.IGNORECASE
+    ),
+    re.compile(r'\b(?:last|this|next)\s+(?:week|month|year|quarter)\b', re.IGNORECASE),
+)
+
 async def parse_query(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Parse user query to extract intent and entities
     """
     state["current_step"] = "parsing_query"
-    
+
     query = state.get("query", "").lower()
-    
+    hits = _scan_keywords(query)
+
     # Extract intent
-    intent = _extract_intent(query)
-    
+    intent = _extract_intent(hits)
+
     # Extract entities
-    entities = _extract_entities(query)
-    
+    entities = _extract_entities(query, hits)
+
     # Extract metrics
-    metrics = _extract_metrics(query)
-    
+    metrics = _extract_metrics(hits)
+
     state["parsed_query"] = {
         "original": state.get("query"),
         "intent": intent,
         "entities": entities,
         "metrics": metrics
     }
-    
+
     return state
 
-def _extract_intent(query: str) -> str:
+def _scan_keywords(query: str) -> Dict[str, Set[Tuple[int, str]]]:
+    """
+    Collect ranked intent/focus/metric tags for every keyword in the query
+    """
+    hits = {"intent": set(), "focus": set(), "metric": set()}
+    for match in _KEYWORD_RE.finditer(query):
+        for kind, ranked_tag in _KEYWORD_TAGS[match.group(1)]:
+            hits[kind].add(ranked_tag)
+    return hits
+
+def _extract_intent(hits: Dict[str, Set[Tuple[int, str]]]) -> str:
     """
     Extract the main intent from the query
     """
-    if any(word in query for word in ["show", "display", "visualize", "chart", "graph"]):
-        return "visualize"
-    elif any(word in query for word in ["calculate", "compute", "sum", "average", "mean"]):
-        return "calculate"
-    elif any(word in query for word in ["compare", "versus", "vs", "between"]):
-        return "compare"
-    elif any(word in query for word in ["trend", "pattern", "forecast", "predict"]):
-        return "analyze_trend"
-    elif any(word in query for word in ["top", "best", "highest", "largest"]):
-        return "top_n"
-    elif any(word in query for word in ["anomaly", "outlier", "unusual", "abnormal"]):
-        return "detect_anomaly"
-    else:
-        return "general_analysis"
-
-def _extract_entities(query: str) -> Dict[str, Any]:
+    if hits["intent"]:
+        return min(hits["intent"])[1]
+    return "general_analysis"
+
+def _extract_entities(query: str, hits: Dict[str, Set[Tuple[int, str]]]) -> Dict[str, Any]:
     """
     Extract entities like customer, product, date ranges
     """
     entities = {}
-    
+
     # Extract numbers
-    numbers = re.findall(r'\b\d+\b', query)
+    numbers = _NUMBER_RE.findall(query)
     if numbers:
-        entities["numbers"] = [int(n) for n in numbers]
-    
+        entities["numbers"] = list(map(int, numbers))
+
     # Extract date-related terms
-    date_patterns = [
-        r'\b\d{4}-\d{2}-\d{2}\b',
-        r'\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b',
-        r'\b(?:last|this|next)\s+(?:week|month|year|quarter)\b'
-    ]
-    
-    for pattern in date_patterns:
-        matches = re.findall(pattern, query, re.IGNORECASE)
+    for pattern in _DATE_RES:
+        matches = pattern.findall(query)
         if matches:
             entities["dates"] = matches
             break
-    
+
     # Extract business entities
-    if "customer" in query:
-        entities["focus"] = "customer"
-    elif "product" in query:
-        entities["focus"] = "product"
-    elif "revenue" in query:
-        entities["focus"] = "revenue"
-    elif "order" in query:
-        entities["focus"] = "order"
-    
+    if hits["focus"]:
+        entities["focus"] = min(hits["focus"])[1]
+
     return entities
 
-def _extract_metrics(query: str) -> list:
+def _extract_metrics(hits: Dict[str, Set[Tuple[int, str]]]) -> list:
     """
     Extract metrics mentioned in the query
     """
-    metrics = []
-    
-    metric_keywords = {
-        "revenue": ["revenue", "sales", "income"],
-        "quantity": ["quantity", "amount", "volume", "units"],
-        "profit": ["profit", "margin", "earnings"],
-        "cost": ["cost", "expense", "spending"],
-        "count": ["count", "number", "total"],
-        "average": ["average", "mean", "avg"],
-        "sum": ["sum", "total", "aggregate"]
-    }
-    
-    for metric, keywords in metric_keywords.items():
-        if any(keyword in query for keyword in keywords):
-            metrics.append(metric)
-    
-    return metrics
\ No newline at end of file
+    return [metric for _, metric in sorted(hits["metric"])]
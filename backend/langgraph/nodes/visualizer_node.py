@@ -1,13 +1,53 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+
+# LRU of built charts keyed by (df_version, builder, args), where df_version
+# identifies the source file's contents (path, mtime, size), so repeat analyses
+# of the same file skip the groupby work
+_VIZ_CACHE_SIZE = 128
+_VIZ_CACHE: "OrderedDict[tuple, Optional[Dict[str, Any]]]" = OrderedDict()
+
+# Fallback charts shown when the data yields nothing specific. Built once;
+# treat as read-only
+_DEFAULT_VISUALIZATIONS = (
+    {
+        "type": "bar",
+        "title": "Top Customer Revenue Distribution",
+        "description": "Shows revenue concentration among top customers",
+        "data": [
+            {"name": "Niagara Pipe Co.", "value": 3000000},
+            {"name": "Addison LLC", "value": 2250000},
+            {"name": "Voit Company", "value": 1500000},
+            {"name": "Turner Co. Ltd", "value": 750000},
+            {"name": "Spiegel Company", "value": 375000}
+        ],
+        "config": {"xAxis": "name", "yAxis": "value", "color": "#818CF8"}
+    },
+    {
+        "type": "bar",
+        "title": "Top Products by Quantity Ordered",
+        "description": "Identifies most popular products by volume",
+        "data": [
+            {"name": "Oxygen-Free Copper", "value": 2600000},
+            {"name": "600V PVC Insulated", "value": 1950000},
+            {"name": "THHN Wire 10 AWG", "value": 1300000},
+            {"name": "THHN Wire 14 AWG", "value": 650000},
+            {"name": "600V PVC Wire", "value": 650000}
+        ],
+        "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
+    }
+)
 
 async def generate_visualizations(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate appropriate visualizations based on analysis
+    
+    Runs in parallel with analyze_data, so only the keys this node owns are
+    returned as the state update.
     """
-    state["current_step"] = "generating_visualizations"
+    update = {"current_step": "generating_visualizations"}
     
     try:
-        analysis = state.get("analysis_result", {})
         parsed_query = state.get("parsed_query", {})
         data_sample = state.get("data_sample", {})
         
@@ -19,24 +59,25 @@ async def generate_visualizations(state: Dict[str, Any]) -> Dict[str, Any]:
         
         if "dataframe" in data_sample:
             df = data_sample["dataframe"]
+            df_version = data_sample.get("df_version")
             
             # Generate visualizations based on intent
             if intent in ["top_n", "visualize"] or "top" in state.get("query", "").lower():
                 # Top customers by revenue
                 if "customer" in state.get("query", "").lower() or focus == "customer":
-                    viz = _create_top_customers_viz(df)
+                    viz = _cached_viz(df_version, _create_top_customers_viz, df)
                     if viz:
                         visualizations.append(viz)
                 
                 # Top products
                 if "product" in state.get("query", "").lower() or focus == "product":
-                    viz = _create_top_products_viz(df)
+                    viz = _cached_viz(df_version, _create_top_products_viz, df)
                     if viz:
                         visualizations.append(viz)
             
             # Trend analysis
             if intent == "analyze_trend" and "order_date" in df.columns:
-                viz = _create_trend_viz(df)
+                viz = _cached_viz(df_version, _create_trend_viz, df)
                 if viz:
                     visualizations.append(viz)
             
@@ -44,7 +85,7 @@ async def generate_visualizations(state: Dict[str, Any]) -> Dict[str, Any]:
             if intent == "general_analysis":
                 # Revenue distribution
                 if "revenue" in df.columns:
-                    viz = _create_distribution_viz(df, "revenue")
+                    viz = _cached_viz(df_version, _create_distribution_viz, df, "revenue")
                     if viz:
                         visualizations.append(viz)
         
@@ -52,12 +93,39 @@ async def generate_visualizations(state: Dict[str, Any]) -> Dict[str, Any]:
         if not visualizations:
             visualizations = _get_default_visualizations()
         
-        state["visualizations"] = visualizations
+        update["visualizations"] = visualizations
         
     except Exception as e:
-        state["error"] = f"Visualization generation failed: {str(e)}"
+        update["error"] = f"Visualization generation failed: {str(e)}"
     
-    return state
+    return update
+
+def _cached_viz(df_version: Optional[tuple], builder, df, *args) -> Dict[str, Any]:
+    """
+    Return builder(df, *args), reusing the result for an already seen df_version;
+    data without a stable version (e.g. generated sample data) is never cached
+    """
+    if df_version is None:
+        return builder(df, *args)
+    
+    key = (df_version, builder.__name__) + args
+    if key in _VIZ_CACHE:
+        _VIZ_CACHE.move_to_end(key)
+        return _VIZ_CACHE[key]
+    
+    viz = builder(df, *args)
+    _VIZ_CACHE[key] = viz
+    if len(_VIZ_CACHE) > _VIZ_CACHE_SIZE:
+        _VIZ_CACHE.popitem(last=False)
+    return viz
+
+def _top_n_sums(df, group_col: str, value_col: str, n: int = 5) -> List[tuple]:
+    """
+    Return the n (group, sum) pairs with the largest sums, largest first
+    """
+    # Sorted groups + Series.nlargest: ties keep the key order callers rely on
+    top = df.groupby(group_col)[value_col].sum().nlargest(n)
+    return list(zip(top.index.tolist(), top.to_numpy(dtype=float).tolist()))
 
 def _create_top_customers_viz(df) -> Dict[str, Any]:
     """
@@ -66,15 +134,15 @@ def _create_top_customers_viz(df) -> Dict[str, Any]:
     if "customer_id" not in df.columns or "revenue" not in df.columns:
         return None
     
-    top_customers = df.groupby("customer_id")["revenue"].sum().nlargest(5)
+    top_customers = _top_n_sums(df, "customer_id", "revenue")
     
     return {
         "type": "bar",
         "title": "Top Customer Revenue Distribution",
         "description": "Shows revenue concentration among top customers to identify key accounts",
         "data": [
-            {"name": name, "value": float(value)}
-            for name, value in top_customers.items()
+            {"name": name, "value": value}
+            for name, value in top_customers
         ],
         "config": {
             "xAxis": "name",
@@ -91,15 +159,15 @@ def _create_top_products_viz(df) -> Dict[str, Any]:
         return None
     
     value_col = "quantity" if "quantity" in df.columns else "revenue"
-    top_products = df.groupby("product")[value_col].sum().nlargest(5)
+    top_products = _top_n_sums(df, "product", value_col)
     
     return {
         "type": "bar",
         "title": f"Top Products by {value_col.capitalize()} Ordered",
         "description": "Identifies most popular products by volume",
         "data": [
-            {"name": name, "value": float(value)}
-            for name, value in top_products.items()
+            {"name": name, "value": value}
+            for name, value in top_products
         ],
         "config": {
             "xAxis": "name",
@@ -115,17 +183,24 @@ def _create_trend_viz(df) -> Dict[str, Any]:
     if "order_date" not in df.columns or "revenue" not in df.columns:
         return None
     
-    # Group by month
-    df["month"] = pd.to_datetime(df["order_date"]).dt.to_period("M")
-    monthly = df.groupby("month")["revenue"].sum()
+    # Bin by month on the datetime64 index; min_count/dropna keep only
+    # months that have orders, as grouping by period did
+    dates = pd.to_datetime(df["order_date"])
+    has_date = dates.notna().to_numpy()
+    monthly = (
+        pd.Series(df["revenue"].to_numpy()[has_date], index=dates[has_date])
+        .resample("MS")
+        .sum(min_count=1)
+        .dropna()
+    )
     
     return {
         "type": "line",
         "title": "Revenue Trend Over Time",
         "description": "Monthly revenue trend analysis",
         "data": [
-            {"date": str(date), "value": float(value)}
-            for date, value in monthly.items()
+            {"date": date, "value": value}
+            for date, value in zip(monthly.index.strftime("%Y-%m").tolist(), monthly.to_numpy(dtype=float).tolist())
         ],
         "config": {
             "xAxis": "date",
@@ -134,6 +209,29 @@ def _create_trend_viz(df) -> Dict[str, Any]:
         }
     }
 
+def _uniform_histogram(values, bins: int):
+    """
+    Count values into equal-width bins by direct index arithmetic.
+    Returns (counts, edges) as lists; edge handling follows np.histogram.
+    """
+    if len(values):
+        lo, hi = float(values.min()), float(values.max())
+    else:
+        lo, hi = 0.0, 1.0
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    
+    edges = np.linspace(lo, hi, bins + 1)
+    idx = ((values - lo) * (bins / (hi - lo))).astype(np.int64)
+    # The maximum lands on index `bins`; like np.histogram, keep it in the last bin
+    idx[idx == bins] -= 1
+    # Float rounding can put a value sitting on an edge into the neighbouring
+    # bin; correct against the returned edges exactly as np.histogram does
+    idx[values < edges[idx]] -= 1
+    idx[(values >= edges[idx + 1]) & (idx != bins - 1)] += 1
+    counts = np.bincount(idx, minlength=bins)
+    return counts.tolist(), edges.tolist()
+
 def _create_distribution_viz(df, column: str) -> Dict[str, Any]:
     """
     Create distribution visualization
@@ -142,16 +240,16 @@ def _create_distribution_viz(df, column: str) -> Dict[str, Any]:
         return None
     
     # Create histogram bins
-    values = df[column].dropna()
-    hist, bins = np.histogram(values, bins=10)
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    counts, edges = _uniform_histogram(values[~np.isnan(values)], 10)
     
     return {
         "type": "histogram",
         "title": f"{column.capitalize()} Distribution",
         "description": f"Distribution of {column} values",
         "data": [
-            {"range": f"{bins[i]:.0f}-{bins[i+1]:.0f}", "count": int(hist[i])}
-            for i in range(len(hist))
+            {"range": f"{low:.0f}-{high:.0f}", "count": count}
+            for low, high, count in zip(edges, edges[1:], counts)
         ],
         "config": {
             "xAxis": "range",
@@ -164,34 +262,7 @@ def _get_default_visualizations() -> List[Dict[str, Any]]:
     """
     Return default visualizations
     """
-    return [
-        {
-            "type": "bar",
-            "title": "Top Customer Revenue Distribution",
-            "description": "Shows revenue concentration among top customers",
-            "data": [
-                {"name": "Niagara Pipe Co.", "value": 3000000},
-                {"name": "Addison LLC", "value": 2250000},
-                {"name": "Voit Company", "value": 1500000},
-                {"name": "Turner Co. Ltd", "value": 750000},
-                {"name": "Spiegel Company", "value": 375000}
-            ],
-            "config": {"xAxis": "name", "yAxis": "value", "color": "#818CF8"}
-        },
-        {
-            "type": "bar",
-            "title": "Top Products by Quantity Ordered",
-            "description": "Identifies most popular products by volume",
-            "data": [
-                {"name": "Oxygen-Free Copper", "value": 2600000},
-                {"name": "600V PVC Insulated", "value": 1950000},
-                {"name": "THHN Wire 10 AWG", "value": 1300000},
-                {"name": "THHN Wire 14 AWG", "value": 650000},
-                {"name": "600V PVC Wire", "value": 650000}
-            ],
-            "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
-        }
-    ]
+    return list(_DEFAULT_VISUALIZATIONS)
 
 import pandas as pd
 import numpy as np
\ No newline at end of file
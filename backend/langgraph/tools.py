@@ -2,6 +2,21 @@ from typing import Dict, Any, List
 import pandas as pd
 import numpy as np
 
+try:
+    import numexpr  # noqa: F401
+    _EVAL_ENGINE = "numexpr"
+except ImportError:
+    _EVAL_ENGINE = "python"
+
+_FILTER_OPS = (("gt", ">"), ("lt", "<"), ("eq", "=="))
+
+# (keywords that must all appear, SQL template), checked in order
+_SQL_RULES = (
+    (("top", "customers"), "SELECT customer_id, SUM(revenue) as total_revenue FROM data GROUP BY customer_id ORDER BY total_revenue DESC LIMIT 5"),
+    (("average",), "SELECT AVG({column}) as average FROM data"),
+    (("count",), "SELECT COUNT(*) as total_count FROM data"),
+)
+
 def calculate_statistics(data: pd.DataFrame, columns: List[str] = None) -> Dict[str, Any]:
     """
     Calculate statistics for specified columns
@@ -9,46 +24,56 @@ def calculate_statistics(data: pd.DataFrame, columns: List[str] = None) -> Dict[
     if columns is None:
         columns = data.select_dtypes(include=[np.number]).columns.tolist()
     
+    columns = [col for col in dict.fromkeys(columns) if col in data.columns]
+    if not columns:
+        return {}
+    
+    # One agg and one quantile call instead of eight reductions per column
+    subset = data[columns]
+    summary = subset.agg(["mean", "median", "std", "min", "max"])
+    quartiles = subset.quantile([0.25, 0.5, 0.75])
+    
     stats = {}
     for col in columns:
-        if col in data.columns:
-            stats[col] = {
-                "mean": float(data[col].mean()),
-                "median": float(data[col].median()),
-                "std": float(data[col].std()),
-                "min": float(data[col].min()),
-                "max": float(data[col].max()),
-                "quartiles": [
-                    float(data[col].quantile(0.25)),
-                    float(data[col].quantile(0.5)),
-                    float(data[col].quantile(0.75))
-                ]
-            }
+        stats[col] = {
+            "mean": float(summary.at["mean", col]),
+            "median": float(summary.at["median", col]),
+            "std": float(summary.at["std", col]),
+            "min": float(summary.at["min", col]),
+            "max": float(summary.at["max", col]),
+            "quartiles": [float(q) for q in quartiles[col]]
+        }
     return stats
 
 def filter_data(data: pd.DataFrame, conditions: Dict[str, Any]) -> pd.DataFrame:
     """
     Filter data based on conditions
     """
-    filtered = data.copy()
+    # Comparisons are joined into one expression evaluated in a single
+    # DataFrame.eval call; values are bound as @locals, never formatted in
+    mask = np.ones(len(data), dtype=bool)
+    exprs = []
+    params = {}
     
     for column, condition in conditions.items():
-        if column not in filtered.columns:
+        if column not in data.columns:
             continue
-            
-        if isinstance(condition, dict):
-            if "gt" in condition:
-                filtered = filtered[filtered[column] > condition["gt"]]
-            if "lt" in condition:
-                filtered = filtered[filtered[column] < condition["lt"]]
-            if "eq" in condition:
-                filtered = filtered[filtered[column] == condition["eq"]]
-            if "in" in condition:
-                filtered = filtered[filtered[column].isin(condition["in"])]
-        else:
-            filtered = filtered[filtered[column] == condition]
-    
-    return filtered
+        
+        if not isinstance(condition, dict):
+            condition = {"eq": condition}
+        
+        for key, op in _FILTER_OPS:
+            if key in condition:
+                name = f"v{len(params)}"
+                params[name] = condition[key]
+                exprs.append(f"`{column}` {op} @{name}")
+        if "in" in condition:
+            mask &= data[column].isin(condition["in"]).to_numpy()
+    
+    if exprs:
+        mask &= data.eval(" and ".join(exprs), engine=_EVAL_ENGINE, local_dict=params).to_numpy()
+    
+    return data[mask]
 
 def aggregate_data(data: pd.DataFrame, group_by: str, agg_func: str = "sum") -> pd.DataFrame:
     """
@@ -70,21 +95,23 @@ def detect_anomalies(data: pd.DataFrame, column: str, method: str = "iqr") -> Li
         return []
     
     if method == "iqr":
-        Q1 = data[column].quantile(0.25)
-        Q3 = data[column].quantile(0.75)
+        values = data[column].to_numpy(dtype=float, na_value=np.nan)
+        Q1, Q3 = np.nanquantile(values, [0.25, 0.75])
         IQR = Q3 - Q1
         lower_bound = Q1 - 1.5 * IQR
         upper_bound = Q3 + 1.5 * IQR
         
-        anomalies = data[(data[column] < lower_bound) | (data[column] > upper_bound)]
-        return anomalies.index.tolist()
+        mask = (values < lower_bound) | (values > upper_bound)
+        return data.index[mask].tolist()
     
     elif method == "zscore":
-        from scipy import stats
-        z_scores = np.abs(stats.zscore(data[column].dropna()))
+        non_null = data[column].dropna()
+        values = non_null.to_numpy(dtype=float)
+        z_scores = values - values.mean()
+        z_scores /= values.std()
+        np.abs(z_scores, out=z_scores)
         threshold = 3
-        anomalies = data.iloc[np.where(z_scores > threshold)[0]]
-        return anomalies.index.tolist()
+        return non_null.index[z_scores > threshold].tolist()
     
     return []
 
@@ -95,15 +122,43 @@ def generate_sql_query(natural_language: str, table_schema: Dict[str, str]) -> s
     # Simplified SQL generation - in production, use LLM
     query_lower = natural_language.lower()
     
-    if "top" in query_lower and "customers" in query_lower:
-        return "SELECT customer_id, SUM(revenue) as total_revenue FROM data GROUP BY customer_id ORDER BY total_revenue DESC LIMIT 5"
-    elif "average" in query_lower:
-        column = next((col for col in table_schema.keys() if col.lower() in query_lower), "revenue")
-        return f"SELECT AVG({column}) as average FROM data"
-    elif "count" in query_lower:
-        return "SELECT COUNT(*) as total_count FROM data"
+    for keywords, template in _SQL_RULES:
+        if all(keyword in query_lower for keyword in keywords):
+            if "{column}" in template:
+                column = next((col for col in table_schema.keys() if col.lower() in query_lower), "revenue")
+                return template.format(column=column)
+            return template
+    
+    return "SELECT * FROM data LIMIT 100"
+
+def _linear_trend(values: np.ndarray):
+    """
+    Least-squares fit of values against their position.
+    Returns (slope, r, two-sided p-value), matching scipy.stats.linregress.
+    """
+    n = len(values)
+    v = values.astype(np.float64, copy=False)
+    dx = np.arange(n, dtype=np.float64) - (n - 1) / 2.0
+    dv = v - v.mean()
+    sxx = dx @ dx
+    sxy = dx @ dv
+    syy = dv @ dv
+    
+    slope = sxy / sxx
+    r_value = 0.0 if syy == 0.0 else float(np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0))
+    
+    if n == 2:
+        p_value = 1.0 if syy == 0.0 else 0.0
+    elif abs(r_value) == 1.0:
+        p_value = 0.0
     else:
-        return "SELECT * FROM data LIMIT 100"
+        # Only the t-distribution tail needs scipy; the fit itself stays in NumPy
+        from scipy.special import stdtr
+        dof = n - 2
+        t_stat = r_value * np.sqrt(dof / (1.0 - r_value * r_value))
+        p_value = float(2 * stdtr(dof, -abs(t_stat)))
+    
+    return slope, r_value, p_value
 
 def analyze_trends(data: pd.DataFrame, date_column: str, value_column: str) -> Dict[str, Any]:
     """
@@ -112,25 +167,26 @@ def analyze_trends(data: pd.DataFrame, date_column: str, value_column: str) -> D
     if date_column not in data.columns or value_column not in data.columns:
         return {"error": "Required columns not found"}
     
+    # Work on a two-column projection so the caller's frame is never mutated
+    # and the sort only moves the columns we use
+    series = data[[date_column, value_column]]
+    
     # Convert to datetime if needed
-    if not pd.api.types.is_datetime64_any_dtype(data[date_column]):
-        data[date_column] = pd.to_datetime(data[date_column])
+    if not pd.api.types.is_datetime64_any_dtype(series[date_column]):
+        series = series.assign(**{date_column: pd.to_datetime(series[date_column])})
     
     # Sort by date
-    data = data.sort_values(date_column)
+    series = series.sort_values(date_column)
     
     # Calculate trend metrics
-    values = data[value_column].values
-    dates = data[date_column].values
+    values = series[value_column].to_numpy()
     
     # Simple linear regression for trend
-    from scipy import stats
-    x = np.arange(len(values))
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, values)
+    slope, r_value, p_value = _linear_trend(values)
     
-    # Moving averages
-    ma_7 = data[value_column].rolling(window=7).mean()
-    ma_30 = data[value_column].rolling(window=30).mean()
+    # Moving averages - only the latest window of each is reported
+    ma_7 = float(values[-7:].mean()) if len(values) >= 7 else np.nan
+    ma_30 = float(values[-30:].mean()) if len(values) >= 30 else np.nan
     
     return {
         "trend_direction": "increasing" if slope > 0 else "decreasing",
@@ -138,7 +194,7 @@ def analyze_trends(data: pd.DataFrame, date_column: str, value_column: str) -> D
         "slope": float(slope),
         "correlation": float(r_value),
         "p_value": float(p_value),
-        "moving_avg_7": ma_7.tail(1).values[0] if len(ma_7) > 0 else None,
-        "moving_avg_30": ma_30.tail(1).values[0] if len(ma_30) > 0 else None,
+        "moving_avg_7": ma_7,
+        "moving_avg_30": ma_30,
         "recent_change": float((values[-1] - values[-2]) / values[-2] * 100) if len(values) > 1 else 0
     }
\ No newline at end of file
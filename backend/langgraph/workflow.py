@@ -1,26 +1,43 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, ClassVar, Annotated
 from langchain_core.messages import BaseMessage
 import json
 
-class AgentState(TypedDict):
+def _last_value(current: Any, update: Any) -> Any:
+    """
+    Reducer for keys that parallel branches may both write; the latest wins
+    """
+    return update
+
+class AgentState(TypedDict, total=False):
+    # Every key the nodes read or write must be declared here, otherwise the
+    # graph drops it between steps. Values are held by reference, so the
+    # DataFrame inside data_sample is shared, never copied.
     messages: List[BaseMessage]
     query: str
     data_file: Optional[str]
+    parsed_query: Optional[Dict]
     data_sample: Optional[Dict]
+    data_context: Optional[Dict]
     analysis_result: Optional[Dict]
     visualizations: Optional[List[Dict]]
     business_impact: Optional[Dict]
     recommendations: Optional[List[str]]
-    current_step: str
-    error: Optional[str]
+    formatted_response: Optional[Dict]
+    current_step: Annotated[str, _last_value]
+    error: Annotated[Optional[str], _last_value]
 
 class DataAnalysisWorkflow:
+    # The graph is static, so it is compiled once and shared by every instance
+    _COMPILED_APP: ClassVar[Optional[Any]] = None
+    
     def __init__(self):
-        self.workflow = StateGraph(AgentState)
-        self._setup_nodes()
-        self._setup_edges()
-        self.app = self.workflow.compile()
+        if DataAnalysisWorkflow._COMPILED_APP is None:
+            self.workflow = StateGraph(AgentState)
+            self._setup_nodes()
+            self._setup_edges()
+            DataAnalysisWorkflow._COMPILED_APP = self.workflow.compile()
+        self.app = DataAnalysisWorkflow._COMPILED_APP
     
     def _setup_nodes(self):
         from backend.langgraph.nodes import (
@@ -43,9 +60,13 @@ class DataAnalysisWorkflow:
         self.workflow.set_entry_point("parse_query")
         
         self.workflow.add_edge("parse_query", "load_data")
+        
+        # Analysis (LLM bound) and visualization (pandas bound) only need the
+        # loaded data, so they fan out in parallel and join before the
+        # business impact step, which reads both of their results
         self.workflow.add_edge("load_data", "analyze_data")
-        self.workflow.add_edge("analyze_data", "generate_visualizations")
-        self.workflow.add_edge("generate_visualizations", "extract_business_impact")
+        self.workflow.add_edge("load_data", "generate_visualizations")
+        self.workflow.add_edge(["analyze_data", "generate_visualizations"], "extract_business_impact")
         self.workflow.add_edge("extract_business_impact", "format_response")
         self.workflow.add_edge("format_response", END)
     
@@ -60,12 +81,17 @@ class DataAnalysisWorkflow:
             "current_step": "starting"
         }
         
-        async for state in self.app.astream(initial_state):
+        # "values" mode yields the full state after each step, which is what
+        # _format_stream_event expects (the default yields per-node updates)
+        async for state in self.app.astream(initial_state, stream_mode="values"):
             yield self._format_stream_event(state)
     
     def _format_stream_event(self, state: Dict) -> Dict:
         """
         Format state updates for streaming to frontend
+        
+        Only these serializable keys are sent; data_sample (and the DataFrame
+        inside it) never reaches the encoder.
         """
         return {
             "step": state.get("current_step", ""),
@@ -1,10 +1,11 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
 import asyncio
-import json
+import orjson
+import aiofiles
 import os
 from pathlib import Path
 
@@ -12,7 +13,7 @@ from backend.config.settings import settings
 from backend.langgraph.workflow import DataAnalysisWorkflow
 from backend.data.csv_processor import CSVProcessor
 
-app = FastAPI(title="AI Data Analyst API")
+app = FastAPI(title="AI Data Analyst API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -23,6 +24,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# NumPy scalars/arrays and non-string keys can come back from the workflow's analysis steps
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def sse_event(payload: dict) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
 # Initialize components
 workflow = DataAnalysisWorkflow()
 csv_processor = CSVProcessor()
@@ -43,7 +53,7 @@ async def analyze_data(request: AnalysisRequest):
     try:
         async def generate():
             async for event in workflow.run(request.query, request.data_file):
-                yield f"data: {json.dumps(event)}\n\n"
+                yield sse_event(event)
         
         return StreamingResponse(
             generate(),
@@ -65,24 +75,33 @@ async def upload_csv(file: UploadFile = File(...)):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
-    # Check file size
-    file_size = 0
-    contents = await file.read()
-    file_size = len(contents) / (1024 * 1024)  # Convert to MB
+    max_bytes = settings.MAX_CSV_SIZE_MB * 1024 * 1024
+    size_error = HTTPException(
+        status_code=400,
+        detail=f"File size exceeds {settings.MAX_CSV_SIZE_MB}MB limit"
+    )
     
-    if file_size > settings.MAX_CSV_SIZE_MB:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"File size exceeds {settings.MAX_CSV_SIZE_MB}MB limit"
-        )
+    # Reject up front when the client already told us the size
+    if file.size is not None and file.size > max_bytes:
+        raise size_error
     
     # Save file
     upload_dir = Path(settings.UPLOAD_DIR)
     upload_dir.mkdir(parents=True, exist_ok=True)
     
+    # Stream to disk in 1 MiB chunks instead of buffering the whole upload
     file_path = upload_dir / file.filename
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > max_bytes:
+                break
+            await f.write(chunk)
+    
+    if file_size > max_bytes:
+        file_path.unlink(missing_ok=True)
+        raise size_error
     
     # Process CSV
     try:
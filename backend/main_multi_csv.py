@@ -1,16 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
 import pandas as pd
 import numpy as np
-import json
+import orjson
 import asyncio
-from typing import Optional, Dict, Any
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 import os
 from datetime import datetime
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Enable CORS
 app.add_middleware(
@@ -21,6 +24,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# NumPy scalars/arrays and non-string keys can come back from generated analysis code
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
+# Optional delay between streamed steps for demos; 0 just yields to the event loop
+STEP_PACING_SECONDS = float(os.getenv("DEMO_PACING", "0"))
+
 class AnalysisRequest(BaseModel):
     query: str
     data_file: Optional[str] = None
@@ -29,27 +42,172 @@ class AnalysisRequest(BaseModel):
 # Global variables for loaded data
 loaded_datasets = {}
 data_stats = {}
+# Loaded dataset names, largest first; the routing fallback picks from this
+datasets_by_size = []
+# Content version per loaded dataset, part of every query cache key
+dataset_versions = {}
+
+# Processed query results keyed by (normalized query, dataset, dataset version);
+# each entry is (result, whether the processor kept it as chart-conversion context)
+QUERY_CACHE_SIZE = 256
+_query_cache: "OrderedDict[tuple, Tuple[Dict[str, Any], bool]]" = OrderedDict()
+
+def dataset_version(path: str, rows: int) -> str:
+    """Fingerprint a loaded CSV by path, modification time, size and loaded rows"""
+    st = os.stat(path)
+    key = f"{path}|{st.st_mtime_ns}|{st.st_size}|{rows}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+async def run_data_query(query: str, primary: Tuple[pd.DataFrame, str, str]) -> Dict[str, Any]:
+    """Run process_data_query off the event loop, reusing results for repeat queries"""
+    import intelligent_query_processor as processor
+    
+    df, name, _ = primary
+    # Chart conversions depend on the previous answer, not just the query text
+    if processor.is_chart_conversion(query):
+        return await asyncio.to_thread(processor.process_data_query, query, df)
+    
+    key = (" ".join(query.lower().split()), name, dataset_versions.get(name))
+    if key in _query_cache:
+        _query_cache.move_to_end(key)
+        result, remembered = _query_cache[key]
+        # Replay the context update the original run made, so a follow-up
+        # conversion works from this answer rather than an older one
+        if remembered:
+            processor.remember_query_result(result)
+        return result
+    
+    context_before = processor.last_query_result
+    result = await asyncio.to_thread(processor.process_data_query, query, df)
+    # Failed or fallback analyses (e.g. after an OpenAI error) are retried on the
+    # next request rather than cached
+    if "error" not in result and not result.get("fallback"):
+        _query_cache[key] = (result, processor.last_query_result is not context_before)
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return result
+
+def result_visualizations(result: Dict[str, Any]) -> list:
+    """Return a processor result's charts, whichever key they came back under"""
+    if "visualizations" in result:
+        return list(result["visualizations"])
+    if "visualization" in result:
+        return [result["visualization"]]
+    return []
+
+async def run_selected_datasets_query(query: str, datasets: Dict[str, pd.DataFrame], primary: Tuple[pd.DataFrame, str, str]) -> Dict[str, Any]:
+    """Query every selected dataset concurrently and fold the others' answers into the primary result"""
+    names = list(datasets)
+    results = dict(zip(names, await asyncio.gather(
+        *(run_data_query(query, (datasets[name], name, name)) for name in names)
+    )))
+    
+    primary_name = primary[1]
+    merged = dict(results[primary_name])  # Shallow copy keeps cached results untouched
+    others = [(name, result) for name, result in results.items() if name != primary_name and "answer" in result]
+    if others and "answer" in merged:
+        merged["answer"] += "".join(f"\n\n[{name}] {result['answer']}" for name, result in others)
+        merged["visualizations"] = result_visualizations(merged) + [
+            viz for _, result in others for viz in result_visualizations(result)
+        ]
+        merged.pop("visualization", None)
+    return merged
+
+# Bytes sampled from the head of a CSV to estimate its average line length
+_ROW_SAMPLE_BYTES = 64 * 1024
+
+# Rows sampled per text column when estimating a dataset's memory use
+_MEMORY_SAMPLE_ROWS = 1000
+
+# Routing keywords, found in a single case-insensitive scan of the query
+_ROUTING_KEYWORD_RE = re.compile(r"quote|detail|order", re.IGNORECASE)
+
+# (required keywords, dataset, display name) in routing priority order
+_DATASET_ROUTES = (
+    ({"quote", "detail"}, 'quotedetail', 'Quote Details'),
+    ({"quote"}, 'quote', 'Quotes'),
+    ({"order"}, 'salesorder', 'Sales Orders'),
+)
+
+def pick_primary(query: str, datasets: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, str, str]:
+    """Pick the dataset a query is about, returning (frame, name, display name)"""
+    keywords = {k.lower() for k in _ROUTING_KEYWORD_RE.findall(query)}
+    for required, name, display_name in _DATASET_ROUTES:
+        if required <= keywords and name in datasets:
+            return datasets[name], name, display_name
+    
+    # Use the largest dataset as primary
+    name = next((n for n in datasets_by_size if n in datasets), None)
+    if name is None:
+        name = max(datasets, key=lambda k: len(datasets[k]))
+    return datasets[name], name, 'Combined Data'
+
+def estimate_csv_rows(file_path: str) -> int:
+    """Estimate data rows from the file size and the average line length of its first block"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(_ROW_SAMPLE_BYTES)
+    lines = sample.count(b"\n")
+    if lines == 0:
+        return 0
+    return int(os.path.getsize(file_path) * lines / len(sample)) - 1
 
 def load_csv_efficiently(file_path: str, name: str, row_limit: int = 100000):
     """Load CSV with memory optimization for large files"""
     try:
         print(f"Loading {name} from {file_path}...")
         
-        # First, get the total number of rows
-        total_rows = sum(1 for line in open(file_path, 'r', encoding='utf-8', errors='ignore')) - 1
+        # Read one row past the limit to learn whether the file is larger,
+        # rather than counting every line first
+        df = pd.read_csv(file_path, nrows=row_limit + 1, low_memory=False)
         
-        if total_rows > row_limit:
-            print(f"{name}: {total_rows} rows found, loading first {row_limit} rows for performance")
-            df = pd.read_csv(file_path, nrows=row_limit, low_memory=False)
+        if len(df) > row_limit:
+            df = df.iloc[:row_limit].copy()
+            total_rows = max(estimate_csv_rows(file_path), row_limit + 1)
+            print(f"{name}: ~{total_rows:,} rows estimated, loading first {row_limit} rows for performance")
         else:
-            df = pd.read_csv(file_path, low_memory=False)
+            total_rows = len(df)
         
+        # Columns keep their parsed dtypes: the frame goes to generated pandas
+        # code that expects plain strings and full-width numbers
         print(f"Loaded {len(df)} rows from {name}")
         return df, total_rows
     except Exception as e:
         print(f"Error loading {name}: {e}")
         return None, 0
 
+def estimate_memory_bytes(df: pd.DataFrame) -> float:
+    """Estimate deep memory use, sizing string cells from a head sample instead of every row"""
+    shallow = df.memory_usage(deep=False).sum()
+    text_cols = df.select_dtypes(include=['object', 'string']).columns
+    if len(df) == 0 or len(text_cols) == 0:
+        return shallow
+    
+    sample = df[text_cols].head(_MEMORY_SAMPLE_ROWS)
+    per_row = (sample.memory_usage(deep=True, index=False) - sample.memory_usage(deep=False, index=False)).sum() / len(sample)
+    return shallow + per_row * len(df)
+
+def load_and_stat(name: str, path: str, row_limit: int = 100000):
+    """Load one CSV and compute its data_stats entry; returns (df, stats, memory bytes)"""
+    df, total_rows = load_csv_efficiently(path, name, row_limit)
+    if df is None:
+        return None, None, 0
+    
+    # Calculate stats for the dataset
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    memory_bytes = estimate_memory_bytes(df)
+    cells = len(df) * len(df.columns)
+    null_cells = cells - int(df.count().sum())
+    stats = {
+        'loaded_rows': len(df),
+        'total_rows': total_rows,
+        'columns': len(df.columns),
+        'numeric_columns': len(numeric_cols),
+        'column_names': list(df.columns)[:20],  # First 20 columns
+        'memory_usage': f"{memory_bytes / 1024**2:.2f} MB",
+        'null_percentage': (null_cells / cells) * 100 if cells else 0.0
+    }
+    return df, stats, memory_bytes
+
 # Load all datasets on startup
 @app.on_event("startup")
 async def startup_event():
@@ -62,27 +220,32 @@ async def startup_event():
         'quotedetail': r"C:\Users\User\Documents\DVwithCC\quotedetail.csv"
     }
     
+    available = {}
     for name, path in datasets_config.items():
         if os.path.exists(path):
-            df, total_rows = load_csv_efficiently(path, name)
-            if df is not None:
-                loaded_datasets[name] = df
-                
-                # Calculate stats for each dataset
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                data_stats[name] = {
-                    'loaded_rows': len(df),
-                    'total_rows': total_rows,
-                    'columns': len(df.columns),
-                    'numeric_columns': len(numeric_cols),
-                    'column_names': list(df.columns)[:20],  # First 20 columns
-                    'memory_usage': f"{df.memory_usage(deep=True).sum() / 1024**2:.2f} MB"
-                }
+            available[name] = path
         else:
             print(f"Warning: {name} file not found at {path}")
     
+    # Datasets are independent, so load them concurrently in worker threads
+    results = await asyncio.gather(
+        *(asyncio.to_thread(load_and_stat, name, path) for name, path in available.items())
+    )
+    
+    total_memory = 0
+    for name, (df, stats, memory_bytes) in zip(available, results):
+        if df is not None:
+            loaded_datasets[name] = df
+            data_stats[name] = stats
+            dataset_versions[name] = dataset_version(available[name], len(df))
+            total_memory += memory_bytes
+    _query_cache.clear()
+    
+    # Stable sort keeps config order among equally sized datasets, like max()
+    datasets_by_size[:] = sorted(loaded_datasets, key=lambda k: len(loaded_datasets[k]), reverse=True)
+    
     print(f"\nLoaded datasets: {list(loaded_datasets.keys())}")
-    print(f"Total memory usage: {sum(df.memory_usage(deep=True).sum() for df in loaded_datasets.values()) / 1024**2:.2f} MB")
+    print(f"Total memory usage: {total_memory / 1024**2:.2f} MB")
 
 @app.get("/")
 def read_root():
@@ -110,7 +273,7 @@ async def analyze_data(request: AnalysisRequest):
                 datasets_to_use = loaded_datasets
             
             if not datasets_to_use:
-                yield f"data: {json.dumps({'error': 'No datasets available'})}\n\n"
+                yield sse_event({'error': 'No datasets available'})
                 return
             
             steps = [
@@ -121,21 +284,30 @@ async def analyze_data(request: AnalysisRequest):
                 {"step": "extracting_insights", "message": "Generating recommendations..."},
             ]
             
+            primary = pick_primary(request.query, datasets_to_use)
+            query_result = None
+            
             for step in steps:
-                await asyncio.sleep(0.5)
+                await asyncio.sleep(STEP_PACING_SECONDS)
                 
                 if step["step"] == "analyzing_data":
-                    analysis = await perform_multi_dataset_analysis(request.query, datasets_to_use)
-                    yield f"data: {json.dumps({'step': step['step'], 'analysis': analysis})}\n\n"
+                    # Run the query once; the later steps only read from this result.
+                    # An explicit multi-dataset selection queries each dataset in parallel
+                    if request.datasets and len(datasets_to_use) > 1:
+                        query_result = await run_selected_datasets_query(request.query, datasets_to_use, primary)
+                    else:
+                        query_result = await run_data_query(request.query, primary)
+                    analysis = perform_multi_dataset_analysis(query_result, datasets_to_use, primary)
+                    yield sse_event({'step': step['step'], 'analysis': analysis})
                 elif step["step"] == "generating_visualizations":
-                    visualizations = generate_visualizations_from_datasets(request.query, datasets_to_use)
+                    visualizations = generate_visualizations_from_datasets(query_result)
                     print(f"[STREAMING] Sending {len(visualizations)} visualizations")
-                    yield f"data: {json.dumps({'step': step['step'], 'visualizations': visualizations})}\n\n"
+                    yield sse_event({'step': step['step'], 'visualizations': visualizations})
                 elif step["step"] == "extracting_insights":
-                    recommendations = generate_recommendations_from_datasets(request.query, datasets_to_use)
-                    yield f"data: {json.dumps({'step': step['step'], 'recommendations': recommendations})}\n\n"
+                    recommendations = generate_recommendations_from_datasets(query_result, datasets_to_use, primary)
+                    yield sse_event({'step': step['step'], 'recommendations': recommendations})
                 else:
-                    yield f"data: {json.dumps(step)}\n\n"
+                    yield sse_event(step)
         
         return StreamingResponse(
             generate(),
@@ -148,30 +320,9 @@ async def analyze_data(request: AnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def perform_multi_dataset_analysis(query: str, datasets: Dict[str, pd.DataFrame]):
+def perform_multi_dataset_analysis(query_result: Dict[str, Any], datasets: Dict[str, pd.DataFrame], primary: Tuple[pd.DataFrame, str, str]):
     """Analyze across multiple datasets"""
-    from intelligent_query_processor import process_data_query
-    
-    # Determine which dataset is most relevant for the query
-    query_lower = query.lower()
-    
-    # Smart dataset selection based on query keywords
-    if 'quote' in query_lower and 'detail' in query_lower and 'quotedetail' in datasets:
-        primary_dataset = datasets['quotedetail']
-        dataset_name = 'quotedetail'
-    elif 'quote' in query_lower and 'quote' in datasets:
-        primary_dataset = datasets['quote']
-        dataset_name = 'quote'
-    elif 'order' in query_lower and 'salesorder' in datasets:
-        primary_dataset = datasets['salesorder']
-        dataset_name = 'salesorder'
-    else:
-        # Use the largest dataset as primary
-        primary_dataset = max(datasets.values(), key=len)
-        dataset_name = [k for k, v in datasets.items() if v is primary_dataset][0]
-    
-    # Process query with the primary dataset
-    query_result = process_data_query(query, primary_dataset)
+    primary_dataset, dataset_name, _ = primary
     
     if "answer" in query_result:
         # Add context about which dataset was used
@@ -192,64 +343,24 @@ async def perform_multi_dataset_analysis(query: str, datasets: Dict[str, pd.Data
         "metrics": {}
     }
 
-def generate_visualizations_from_datasets(query: str, datasets: Dict[str, pd.DataFrame]):
+def generate_visualizations_from_datasets(query_result: Dict[str, Any]):
     """Generate visualizations from the most relevant dataset"""
-    from intelligent_query_processor import process_data_query
+    from intelligent_query_processor import clean_visualization_data
     
-    # Determine primary dataset
-    query_lower = query.lower()
-    if 'quote' in query_lower and 'detail' in query_lower and 'quotedetail' in datasets:
-        primary_dataset = datasets['quotedetail']
-    elif 'quote' in query_lower and 'quote' in datasets:
-        primary_dataset = datasets['quote']
-    elif 'order' in query_lower and 'salesorder' in datasets:
-        primary_dataset = datasets['salesorder']
-    else:
-        primary_dataset = max(datasets.values(), key=len)
-    
-    # Get visualizations from query processor
-    query_result = process_data_query(query, primary_dataset)
-    
-    visualizations = []
-    if "visualizations" in query_result:
-        visualizations = query_result["visualizations"]
-    elif "visualization" in query_result:
-        visualizations = [query_result["visualization"]]
+    # Get visualizations from the query processor result; copied, since the
+    # result may be a cached entry that later requests are served from
+    visualizations = [dict(viz) for viz in result_visualizations(query_result)]
     
     # Clean up any non-serializable data
     for viz in visualizations:
         if 'data' in viz:
-            for item in viz['data']:
-                for key, value in item.items():
-                    if hasattr(value, 'isoformat'):
-                        item[key] = value.isoformat()
-                    elif pd.isna(value):
-                        item[key] = None
-                    elif not isinstance(value, (str, int, float, bool, type(None))):
-                        item[key] = str(value)
+            viz['data'] = clean_visualization_data(viz['data'])
     
     return visualizations
 
-def generate_recommendations_from_datasets(query: str, datasets: Dict[str, pd.DataFrame]):
+def generate_recommendations_from_datasets(query_result: Dict[str, Any], datasets: Dict[str, pd.DataFrame], primary: Tuple[pd.DataFrame, str, str]):
     """Generate intelligent recommendations based on multi-dataset analysis"""
-    from intelligent_query_processor import process_data_query
-    
-    # Get the primary dataset
-    query_lower = query.lower()
-    if 'quote' in query_lower and 'detail' in query_lower and 'quotedetail' in datasets:
-        primary_dataset = datasets['quotedetail']
-        dataset_name = 'Quote Details'
-    elif 'quote' in query_lower and 'quote' in datasets:
-        primary_dataset = datasets['quote']
-        dataset_name = 'Quotes'
-    elif 'order' in query_lower and 'salesorder' in datasets:
-        primary_dataset = datasets['salesorder']
-        dataset_name = 'Sales Orders'
-    else:
-        primary_dataset = max(datasets.values(), key=len)
-        dataset_name = 'Combined Data'
-    
-    query_result = process_data_query(query, primary_dataset)
+    primary_dataset, dataset_key, dataset_name = primary
     
     if "recommendations" in query_result:
         return query_result["recommendations"]
@@ -261,8 +372,8 @@ def generate_recommendations_from_datasets(query: str, datasets: Dict[str, pd.Da
     if len(datasets) > 1:
         recommendations.append(f"💡 Analyzing {dataset_name} from {len(datasets)} available datasets")
     
-    # Add data quality insights
-    null_percentage = (primary_dataset.isnull().sum().sum() / (len(primary_dataset) * len(primary_dataset.columns))) * 100
+    # Add data quality insights (null share is computed once at load time)
+    null_percentage = data_stats[dataset_key]['null_percentage']
     if null_percentage > 20:
         recommendations.append(f"⚠️ High data incompleteness detected ({null_percentage:.1f}% null values)")
     
@@ -1,14 +1,19 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
+from collections import OrderedDict
 import asyncio
+import hashlib
 import json
+import orjson
 import os
+import time
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import aiofiles
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -16,7 +21,7 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AI Data Analyst API")
+app = FastAPI(title="AI Data Analyst API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -34,6 +39,74 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 Path("./data/uploads").mkdir(parents=True, exist_ok=True)
 Path("./data/cache").mkdir(parents=True, exist_ok=True)
 
+MAX_UPLOAD_BYTES = 1000 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CSV_READ_CHUNK_ROWS = 100000
+
+# LLM summaries keyed by normalized query, kept in memory and under data/cache
+SUMMARY_CACHE_DIR = Path("./data/cache")
+SUMMARY_CACHE_SIZE = 1024
+SUMMARY_CACHE_TTL = 3600
+_summary_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+def summary_cache_key(query: str) -> str:
+    """Hash the lowercased, whitespace-collapsed query"""
+    normalized = " ".join(query.lower().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+def get_cached_summary(key: str) -> Optional[str]:
+    """Return a fresh cached summary from memory or disk, if there is one"""
+    entry = _summary_cache.get(key)
+    if entry is None:
+        try:
+            entry = json.loads((SUMMARY_CACHE_DIR / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # A valid JSON file of the wrong shape (hand-edited, older format) is a miss
+        if (not isinstance(entry, dict) or not isinstance(entry.get("created"), (int, float))
+                or not isinstance(entry.get("summary"), str)):
+            return None
+    
+    if time.time() - entry["created"] > SUMMARY_CACHE_TTL:
+        _summary_cache.pop(key, None)
+        return None
+    
+    _summary_cache[key] = entry
+    _summary_cache.move_to_end(key)
+    if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+    return entry["summary"]
+
+def store_summary(key: str, summary: str):
+    """Cache a summary in memory and persist it for reuse across restarts"""
+    entry = {"created": time.time(), "summary": summary}
+    _summary_cache[key] = entry
+    if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+    try:
+        (SUMMARY_CACHE_DIR / f"{key}.json").write_text(json.dumps(entry), encoding="utf-8")
+    except OSError as e:
+        print(f"[WARNING] Could not persist summary cache entry: {e}")
+
+# NumPy scalars/arrays and non-string keys can come back from generated analysis code
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
+# Optional delay between streamed steps for demos; 0 just yields to the event loop
+STEP_PACING_SECONDS = float(os.getenv("DEMO_PACING", "0"))
+
+# Streamed step order for /api/analyze
+ANALYZE_STEPS = (
+    "parsing_query",
+    "loading_data",
+    "analyzing_data",
+    "generating_visualizations",
+    "extracting_business_impact",
+)
+
 class AnalysisRequest(BaseModel):
     query: str
     data_file: Optional[str] = None
@@ -50,30 +123,15 @@ async def analyze_data(request: AnalysisRequest):
     try:
         async def generate():
             # Simulate workflow steps
-            steps = [
-                {"step": "parsing_query", "message": "Understanding your question..."},
-                {"step": "loading_data", "message": "Loading data..."},
-                {"step": "analyzing_data", "message": "Analyzing patterns..."},
-                {"step": "generating_visualizations", "message": "Creating visualizations..."},
-                {"step": "extracting_business_impact", "message": "Extracting insights..."},
-            ]
-            
-            for step in steps:
-                await asyncio.sleep(0.5)  # Simulate processing
+            for step in ANALYZE_STEPS:
+                await asyncio.sleep(STEP_PACING_SECONDS)
                 
-                # Generate response based on query
-                if step["step"] == "analyzing_data":
+                # Only the analysis depends on the query; other frames are prebuilt
+                if step == "analyzing_data":
                     analysis = await perform_analysis(request.query)
-                    yield f"data: {json.dumps({'step': step['step'], 'analysis': analysis})}\n\n"
-                elif step["step"] == "generating_visualizations":
-                    visualizations = generate_visualizations(request.query)
-                    yield f"data: {json.dumps({'step': step['step'], 'visualizations': visualizations})}\n\n"
-                elif step["step"] == "extracting_business_impact":
-                    impact = generate_business_impact(request.query)
-                    recommendations = generate_recommendations(request.query)
-                    yield f"data: {json.dumps({'step': step['step'], 'business_impact': impact, 'recommendations': recommendations})}\n\n"
+                    yield sse_event({'step': step, 'analysis': analysis})
                 else:
-                    yield f"data: {json.dumps(step)}\n\n"
+                    yield STATIC_STEP_FRAMES[step]
         
         return StreamingResponse(
             generate(),
@@ -88,16 +146,21 @@ async def analyze_data(request: AnalysisRequest):
 
 async def perform_analysis(query: str):
     """Use OpenAI to analyze the query"""
+    cache_key = summary_cache_key(query)
+    summary = get_cached_summary(cache_key)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a data analyst. Provide a brief analysis summary."},
-                {"role": "user", "content": f"Analyze this data query: {query}"}
-            ],
-            max_tokens=200
-        )
-        summary = response.choices[0].message.content
+        if summary is None:
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a data analyst. Provide a brief analysis summary."},
+                    {"role": "user", "content": f"Analyze this data query: {query}"}
+                ],
+                max_tokens=200
+            )
+            summary = response.choices[0].message.content
+            store_summary(cache_key, summary)
     except:
         summary = "The data reveals a B2B electrical/cable supply business with significant revenue concentration among top customers. Product mix is dominated by industrial cables and wires."
     
@@ -174,35 +237,73 @@ def generate_recommendations(query: str):
         "Develop customer diversification strategy to reduce dependency on top accounts"
     ]
 
+# The visualization, impact and recommendation payloads are fixed, so their
+# frames are encoded once at import instead of on every request
+STATIC_STEP_FRAMES = {
+    "parsing_query": sse_event({"step": "parsing_query", "message": "Understanding your question..."}),
+    "loading_data": sse_event({"step": "loading_data", "message": "Loading data..."}),
+    "generating_visualizations": sse_event({
+        "step": "generating_visualizations",
+        "visualizations": generate_visualizations("")
+    }),
+    "extracting_business_impact": sse_event({
+        "step": "extracting_business_impact",
+        "business_impact": generate_business_impact(""),
+        "recommendations": generate_recommendations("")
+    }),
+}
+
 @app.post("/api/upload")
 async def upload_csv(file: UploadFile = File(...)):
     """Upload and process CSV file"""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
-    contents = await file.read()
-    file_size = len(contents) / (1024 * 1024)
-    
-    if file_size > 1000:
-        raise HTTPException(status_code=400, detail="File size exceeds 1000MB limit")
+    size_error = HTTPException(status_code=400, detail="File size exceeds 1000MB limit")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise size_error
     
+    # Stream to disk in 1 MiB chunks instead of buffering the whole upload
     file_path = Path(f"./data/uploads/{file.filename}")
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > MAX_UPLOAD_BYTES:
+                break
+            await f.write(chunk)
+    
+    if file_size > MAX_UPLOAD_BYTES:
+        file_path.unlink(missing_ok=True)
+        raise size_error
     
     # Process CSV
     try:
-        df = pd.read_csv(file_path)
+        rows, sample = await asyncio.to_thread(summarize_csv, file_path)
         return {
             "filename": file.filename,
             "path": str(file_path),
-            "rows": len(df),
-            "columns": df.columns.tolist(),
-            "sample": df.head(10).to_dict('records')
+            "rows": rows,
+            "columns": sample.columns.tolist(),
+            "sample": sample.to_dict('records')
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process CSV: {str(e)}")
 
+def summarize_csv(file_path: Path):
+    """Count rows and keep the first 10 in one chunked pass over the CSV"""
+    rows = 0
+    sample = None
+    with pd.read_csv(file_path, chunksize=CSV_READ_CHUNK_ROWS) as reader:
+        for chunk in reader:
+            rows += len(chunk)
+            if sample is None:
+                sample = chunk.head(10)
+    if sample is None:
+        # Header-only file: no chunks, but the columns are still wanted
+        sample = pd.read_csv(file_path, nrows=0)
+    return rows, sample
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
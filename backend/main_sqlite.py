@@ -4,15 +4,17 @@ No more loading CSVs into memory - direct SQL queries!
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
-import json
+import orjson
 import asyncio
 from typing import List, Dict, Any
 import os
-from intelligent_sqlite_processor import process_sqlite_query, test_sqlite_connection, get_database_stats
+import time
+from collections import OrderedDict
+from intelligent_sqlite_processor import process_sqlite_query, test_sqlite_connection, get_database_stats, DB_PATH
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Enable CORS - allow Railway domains and localhost
 allowed_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -24,9 +26,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# NumPy scalars/arrays and non-string keys can come back from generated analysis code
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
 class QueryRequest(BaseModel):
     query: str
 
+# Seconds a database probe result is reused before it is re-run
+DB_STATUS_TTL = 5.0
+
+# Processed query results keyed by (normalized query, database version)
+QUERY_CACHE_SIZE = 256
+_query_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+def database_version() -> tuple:
+    """Fingerprint the database file, and its WAL if present, by mtime and size"""
+    version = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        version.append((st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+async def run_sqlite_query(query: str) -> Dict[str, Any]:
+    """Run process_sqlite_query off the event loop, reusing results for repeat queries"""
+    key = (" ".join(query.lower().split()), database_version())
+    if key in _query_cache:
+        _query_cache.move_to_end(key)
+        return _query_cache[key]
+    
+    result = await asyncio.to_thread(process_sqlite_query, query)
+    # Failed queries are retried on the next request rather than cached
+    if result.get('success', True) and not result.get('error'):
+        _query_cache[key] = result
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return result
+
 # No need to load CSVs anymore! SQLite handles everything
 print("=" * 60)
 print("[STARTUP] AI Data Analysis Backend with SQLite Database")
@@ -48,6 +90,17 @@ else:
 
 print("=" * 60)
 
+app.state.db_status = db_status
+app.state.db_status_ts = time.monotonic()
+
+def get_db_status():
+    """Return the cached database probe, re-running it when stale or failed"""
+    if (not app.state.db_status['connected']
+            or time.monotonic() - app.state.db_status_ts > DB_STATUS_TTL):
+        app.state.db_status = test_sqlite_connection()
+        app.state.db_status_ts = time.monotonic()
+    return app.state.db_status
+
 @app.get("/")
 async def root():
     return {"message": "AI Data Analysis API with SQLite Database"}
@@ -55,7 +108,7 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint with database status"""
-    db_status = test_sqlite_connection()
+    db_status = get_db_status()
     return {
         "status": "healthy" if db_status['connected'] else "degraded",
         "database": db_status
@@ -64,12 +117,12 @@ async def health():
 @app.get("/stats")
 async def stats():
     """Get database statistics"""
-    return get_database_stats()
+    return await asyncio.to_thread(get_database_stats)
 
 @app.get("/api/datasets-info")
 async def datasets_info():
     """Get dataset information in frontend-compatible format"""
-    stats = get_database_stats()
+    stats = await asyncio.to_thread(get_database_stats)
     
     datasets = {}
     for table_name in ['salesorder', 'quote', 'quotedetail']:
@@ -90,28 +143,28 @@ async def generate_sse_response(query: str):
     """Generate Server-Sent Events for streaming response"""
     
     # Send initial status
-    yield f"data: {json.dumps({'status': 'processing', 'message': 'Analyzing your query with SQLite database...'})}\n\n"
+    yield sse_event({'status': 'processing', 'message': 'Analyzing your query with SQLite database...'})
     await asyncio.sleep(0.1)
     
     try:
         # Send progress update
-        yield f"data: {json.dumps({'status': 'processing', 'message': 'Generating SQL queries and visualizations...'})}\n\n"
+        yield sse_event({'status': 'processing', 'message': 'Generating SQL queries and visualizations...'})
         await asyncio.sleep(0.1)
         
-        # Process query using SQLite
-        result = process_sqlite_query(query)
+        # Process query using SQLite off the event loop
+        result = await run_sqlite_query(query)
         
         # Check if successful
         if result.get('success', True):
             # Send the complete result
-            yield f"data: {json.dumps({'status': 'complete', **result})}\n\n"
+            yield sse_event({'status': 'complete', **result})
         else:
             # Send error with helpful message
-            yield f"data: {json.dumps({'status': 'error', 'error': result.get('error', 'Unknown error'), 'recommendations': result.get('recommendations', [])})}\n\n"
+            yield sse_event({'status': 'error', 'error': result.get('error', 'Unknown error'), 'recommendations': result.get('recommendations', [])})
         
     except Exception as e:
         error_msg = f"Error processing query: {str(e)}"
-        yield f"data: {json.dumps({'status': 'error', 'error': error_msg, 'recommendations': ['Try a simpler query', 'Check your connection']})}\n\n"
+        yield sse_event({'status': 'error', 'error': error_msg, 'recommendations': ['Try a simpler query', 'Check your connection']})
 
 @app.post("/analyze")
 async def analyze(request: QueryRequest):
@@ -123,7 +176,7 @@ async def analyze(request: QueryRequest):
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
     # Check database connection
-    db_status = test_sqlite_connection()
+    db_status = get_db_status()
     if not db_status['connected']:
         raise HTTPException(
             status_code=503, 
@@ -144,7 +197,7 @@ async def analyze(request: QueryRequest):
 async def test_query(request: QueryRequest):
     """Test endpoint for debugging queries"""
     try:
-        result = process_sqlite_query(request.query)
+        result = await run_sqlite_query(request.query)
         return {
             "success": True,
             "query": request.query,
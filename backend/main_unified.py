@@ -4,28 +4,43 @@ Version: 1.0.1 - Fixed query processing and error handling
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
-import json
+from sse_starlette.sse import EventSourceResponse
 import asyncio
+import orjson
 from typing import List, Dict, Any
 import os
 from pathlib import Path
-from intelligent_sqlite_processor import process_sqlite_query, test_sqlite_connection, get_database_stats
+from intelligent_sqlite_processor import process_sqlite_query, test_sqlite_connection, get_database_stats, get_connection
 from init_sample_database import create_sample_database
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# The bundled frontend calls the API from the same origin and needs no CORS;
+# list any separately hosted frontends (comma-separated) in CORS_ORIGINS, as for main_sqlite
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,
 )
 
+# NumPy scalars/arrays and non-string keys can come back from generated analysis code
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Seconds between keep-alive pings while a query is still running
+SSE_PING_SECONDS = 15
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
 class QueryRequest(BaseModel):
     query: str
 
@@ -55,6 +70,42 @@ else:
 
 print("=" * 60)
 
+# Table stats and column names, reused until the database file changes
+_overview_cache: Dict[str, Any] = {"version": None, "stats": None, "columns": {}}
+
+def database_version() -> tuple:
+    """Fingerprint the database file, and its WAL if present, by mtime and size"""
+    version = []
+    for path in (db_path, db_path.with_name(db_path.name + "-wal")):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        version.append((st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+def load_table_columns(table_names) -> Dict[str, List[str]]:
+    """Read column names for each table over the processor's warm connection"""
+    cursor = get_connection().cursor()
+    columns = {}
+    for table_name in table_names:
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        columns[table_name] = [col[1] for col in cursor.fetchall()]
+    return columns
+
+def get_table_overview():
+    """Return (stats, columns), recomputing only when the database has changed"""
+    version = database_version()
+    if _overview_cache["stats"] is None or _overview_cache["version"] != version:
+        stats = get_database_stats()
+        tables = [name for name, info in stats.items() if isinstance(info, dict) and 'row_count' in info]
+        columns = load_table_columns(tables)
+        # An empty result means the stats query failed; try again next time
+        if stats:
+            _overview_cache.update(version=version, stats=stats, columns=columns)
+        return stats, columns
+    return _overview_cache["stats"], _overview_cache["columns"]
+
 # API Routes
 @app.get("/api/health")
 async def health_check():
@@ -75,7 +126,7 @@ async def analyze_data(request: QueryRequest):
     async def generate():
         try:
             # Send initial status
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Processing your query...'})}\n\n"
+            yield sse_event({'type': 'status', 'message': 'Processing your query...'})
             await asyncio.sleep(0.1)
             
             # Process the query using SQLite
@@ -87,29 +138,30 @@ async def analyze_data(request: QueryRequest):
             # Check if there's an error in the result
             if 'error' in result:
                 # Send error
-                yield f"data: {json.dumps({'type': 'error', 'error': result.get('error', 'Unknown error')})}\n\n"
+                yield sse_event({'type': 'error', 'error': result.get('error', 'Unknown error')})
             else:
                 # Add success flag for compatibility
                 result['success'] = True
                 # Send the complete result
-                yield f"data: {json.dumps({'type': 'complete', 'data': result})}\n\n"
+                yield sse_event({'type': 'complete', 'data': result})
                 
         except Exception as e:
             print(f"[ERROR] Query processing failed: {str(e)}")
             import traceback
             traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'error': str(e)})
         
         # Send completion signal
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        yield sse_event({'type': 'done'})
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    # sse_event bytes are sent as-is; the response adds pings and SSE headers
+    return EventSourceResponse(generate(), ping=SSE_PING_SECONDS)
 
 @app.get("/api/stats")
 async def get_stats():
     """Get database statistics"""
     try:
-        stats = get_database_stats()
+        stats, _ = await asyncio.to_thread(get_table_overview)
         return {"success": True, "stats": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -118,20 +170,13 @@ async def get_stats():
 async def get_datasets_info():
     """Get information about loaded datasets"""
     try:
-        stats = get_database_stats()
+        stats, columns = await asyncio.to_thread(get_table_overview)
         datasets = []
         total_rows = 0
         
         for table_name, table_info in stats.items():
             if isinstance(table_info, dict) and 'row_count' in table_info:
-                # Get column information for the table
-                import sqlite3
-                conn = sqlite3.connect(Path(__file__).parent / "database" / "crm_analytics.db")
-                cursor = conn.cursor()
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns_info = cursor.fetchall()
-                column_names = [col[1] for col in columns_info] if columns_info else []
-                conn.close()
+                column_names = columns.get(table_name, [])
                 
                 datasets.append({
                     "name": table_name,
@@ -175,14 +220,39 @@ NEXT_BUILD_PATH = FRONTEND_PATH / ".next"
 NEXT_STATIC_PATH = NEXT_BUILD_PATH / "static"
 PUBLIC_PATH = FRONTEND_PATH / "public"
 
-# Mount static files from Next.js build
-if NEXT_STATIC_PATH.exists():
-    app.mount("/_next/static", StaticFiles(directory=str(NEXT_STATIC_PATH)), name="next-static")
+# Next.js puts a content hash in every /_next/static file name, so browsers
+# can keep them for good and never come back to this process for them
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# URL prefixes for the built frontend assets: (url prefix, directory, Cache-Control)
+STATIC_ROOTS = (
+    ("_next/static/", NEXT_STATIC_PATH, IMMUTABLE_CACHE_CONTROL),
+    ("public/", PUBLIC_PATH, None),
+)
+
+def build_static_map() -> Dict[str, tuple]:
+    """Stat every frontend asset once: url path -> (file path, stat result, Cache-Control)"""
+    static_map = {}
+    for prefix, root, cache_control in STATIC_ROOTS:
+        if not root.exists():
+            continue
+        for file_path in root.rglob("*"):
+            if file_path.is_file():
+                url_path = prefix + file_path.relative_to(root).as_posix()
+                static_map[url_path] = (str(file_path), file_path.stat(), cache_control)
+    return static_map
 
-if PUBLIC_PATH.exists():
-    app.mount("/public", StaticFiles(directory=str(PUBLIC_PATH)), name="public")
+# The build is fixed for the life of the process, so these lookups never go stale
+STATIC_FILES = build_static_map()
+STATIC_PREFIXES = tuple(prefix for prefix, _, _ in STATIC_ROOTS)
 
-# Serve the Next.js app HTML for all non-API routes
+# Prefer the static export's index, otherwise a simple HTML that loads the app
+INDEX_HTML_PATH = FRONTEND_PATH / "out" / "index.html"
+if not INDEX_HTML_PATH.exists():
+    INDEX_HTML_PATH = FRONTEND_PATH / "public" / "index.html"
+print(f"[INFO] Serving {len(STATIC_FILES)} static frontend files")
+
+# Serve the Next.js app HTML and assets for all non-API routes
 @app.get("/{full_path:path}")
 async def serve_nextjs(full_path: str):
     """Catch-all route to serve Next.js pages"""
@@ -190,15 +260,17 @@ async def serve_nextjs(full_path: str):
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="API endpoint not found")
     
-    # For the root path or any other path, serve the Next.js index
-    index_path = FRONTEND_PATH / "out" / "index.html"
-    
-    # If static export exists, use it
-    if index_path.exists():
-        return FileResponse(str(index_path))
+    # Known assets go out via sendfile using the startup stat, no per-request stat()
+    asset = STATIC_FILES.get(full_path)
+    if asset is not None:
+        file_path, stat_result, cache_control = asset
+        headers = {"Cache-Control": cache_control} if cache_control else None
+        return FileResponse(file_path, stat_result=stat_result, headers=headers)
+    if full_path.startswith(STATIC_PREFIXES):
+        raise HTTPException(status_code=404, detail="Static file not found")
     
-    # Otherwise, return a simple HTML that loads the app
-    return FileResponse(str(FRONTEND_PATH / "public" / "index.html"))
+    # For the root path or any other path, serve the Next.js index
+    return FileResponse(str(INDEX_HTML_PATH))
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,11 +1,15 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
 from typing import Optional, Dict, Any, List
 import asyncio
-import json
+import aiofiles
+import orjson
 import os
+import re
+from collections import OrderedDict
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -16,7 +20,7 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AI Data Analyst API")
+app = FastAPI(title="AI Data Analyst API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -38,6 +42,137 @@ Path("./data/cache").mkdir(parents=True, exist_ok=True)
 loaded_data = None
 data_stats = None
 
+# Encoded /api/data-info body; rebuilt lazily after the data changes
+_data_info_body: Optional[bytes] = None
+
+# Default charts for loaded_data, rebuilt whenever the data changes
+_default_visualizations: List[Dict[str, Any]] = []
+
+# Order status codes shown by name in the status chart
+STATUS_NAMES = {1: 'Active', 2: 'Submitted', 3: 'Canceled', 4: 'Fulfilled', 100: 'Invoiced'}
+
+def chart_data(names, values) -> List[Dict[str, Any]]:
+    """Pair label and value columns into chart points with native Python scalars"""
+    return pd.DataFrame({"name": names, "value": values}).to_dict('records')
+
+def build_default_visualizations(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Build the charts shown when a query yields no visualizations of its own"""
+    visualizations = []
+    
+    # 1. Top customers by totalamount
+    if 'customeridname' in df.columns and 'totalamount' in df.columns:
+        # groupby drops null customers; min_count=1 drops customers with no amounts
+        top_customers = df.groupby('customeridname', sort=False, observed=True)['totalamount'].sum(min_count=1).nlargest(5)
+    
+        visualizations.append({
+            "type": "bar",
+            "title": "Top Customer Revenue Distribution",
+            "description": "Shows revenue concentration among top customers to identify key accounts",
+            "data": chart_data(
+                top_customers.index.astype(str).str.slice(0, 30),
+                top_customers.to_numpy(dtype=float)
+            ),
+            "config": {"xAxis": "name", "yAxis": "value", "color": "#818CF8"}
+        })
+    
+    # 2. Order status distribution
+    if 'statuscode' in df.columns:
+        status_counts = df['statuscode'].value_counts().head(5)
+        status_codes = status_counts.index.to_series()
+        status_names = status_codes.map(STATUS_NAMES).fillna("Status " + status_codes.astype(str))
+    
+        visualizations.append({
+            "type": "bar",
+            "title": "Order Status Distribution",
+            "description": "Distribution of order statuses",
+            "data": chart_data(status_names.to_numpy(), status_counts.to_numpy()),
+            "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
+        })
+    
+    # Add a distribution of the first numeric column
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols):
+        col = numeric_cols[0]
+        # np.histogram already bins equal-width data with a single bincount;
+        # reading the raw float array just skips the dropna() Series copy
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        hist, bins = np.histogram(values[~np.isnan(values)], bins=5)
+        
+        visualizations.append({
+            "type": "bar",
+            "title": f"{col} Distribution",
+            "description": f"Distribution of {col} values",
+            "data": chart_data(
+                [f"{lo:.0f}-{hi:.0f}" for lo, hi in zip(bins[:-1], bins[1:])],
+                hist
+            ),
+            "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
+        })
+    
+    return visualizations
+
+# LLM insight summaries keyed by (normalized query, data version)
+ANALYSIS_CACHE_SIZE = 512
+_analysis_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+# Bumped on every (re)load so results computed on older data are never reused
+_data_version = 0
+
+def invalidate_stats():
+    """Refresh cached views of loaded_data after it has been (re)loaded"""
+    global _data_info_body, _default_visualizations, _data_version
+    _data_version += 1
+    _analysis_cache.clear()
+    _data_info_body = None
+    _default_visualizations = build_default_visualizations(loaded_data) if loaded_data is not None else []
+
+# Rows read from the CSV for performance
+CSV_ROW_LIMIT = 100000
+
+MAX_UPLOAD_BYTES = 1000 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Bump when the stored frame's layout changes so older caches are re-parsed
+PARSED_CACHE_FORMAT = 7
+
+# Parsed salesorder.csv kept under data/cache so restarts skip CSV parsing
+PARSED_CACHE_PATH = Path("./data/cache/salesorder.pkl")
+
+def parse_csv(csv_path: Path) -> pd.DataFrame:
+    """Read the first CSV_ROW_LIMIT rows"""
+    # low_memory=False infers each column once over the whole read, not per chunk.
+    # Columns keep their parsed dtypes: text stays object for generated pandas code
+    # and integers keep their full width
+    return pd.read_csv(csv_path, nrows=CSV_ROW_LIMIT, low_memory=False)
+
+def csv_fingerprint(csv_path: Path) -> tuple:
+    """Identify a CSV by mtime and size plus how it was read"""
+    st = csv_path.stat()
+    return (st.st_mtime_ns, st.st_size, CSV_ROW_LIMIT, PARSED_CACHE_FORMAT)
+
+def read_salesorder_frame(csv_path: Path) -> pd.DataFrame:
+    """Return the parsed CSV, from the on-disk cache when it is still current"""
+    fingerprint = csv_fingerprint(csv_path)
+    if PARSED_CACHE_PATH.exists():
+        try:
+            cached_fingerprint, df = pd.read_pickle(PARSED_CACHE_PATH)
+            if cached_fingerprint == fingerprint:
+                print(f"Using parsed cache {PARSED_CACHE_PATH}")
+                return df
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable cache {PARSED_CACHE_PATH}: {e}")
+    
+    df = parse_csv(csv_path)
+    
+    # Write to a temp file first so a crash never leaves a half-written cache
+    try:
+        tmp_path = PARSED_CACHE_PATH.with_suffix(".tmp")
+        pd.to_pickle((fingerprint, df), tmp_path)
+        tmp_path.replace(PARSED_CACHE_PATH)
+    except Exception as e:
+        print(f"[WARNING] Could not write cache {PARSED_CACHE_PATH}: {e}")
+    return df
+
 def load_salesorder_csv():
     """Load the salesorder.csv file at startup"""
     global loaded_data, data_stats
@@ -47,7 +182,7 @@ def load_salesorder_csv():
         print(f"Loading {csv_path}...")
         try:
             # Load with sample for large files
-            loaded_data = pd.read_csv(csv_path, nrows=100000)  # Load first 100k rows for performance
+            loaded_data = read_salesorder_frame(csv_path)
             
             # Calculate statistics
             data_stats = {
@@ -55,9 +190,10 @@ def load_salesorder_csv():
                 "columns": loaded_data.columns.tolist(),
                 "dtypes": {col: str(dtype) for col, dtype in loaded_data.dtypes.items()},
                 "numeric_columns": loaded_data.select_dtypes(include=[np.number]).columns.tolist(),
-                "text_columns": loaded_data.select_dtypes(include=['object']).columns.tolist()
+                "text_columns": loaded_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
             }
             
+            invalidate_stats()
             print(f"Loaded {len(loaded_data)} rows with columns: {data_stats['columns']}")
             return True
         except Exception as e:
@@ -70,6 +206,34 @@ print("Attempting to load salesorder.csv...")
 result = load_salesorder_csv()
 print(f"Load result: {result}")
 
+# Optional delay between streamed steps for demos; 0 just yields to the event loop
+STEP_PACING_SECONDS = float(os.getenv("DEMO_PACING", "0"))
+
+# NumPy scalars/arrays and non-string keys can come back from generated analysis code
+SSE_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Keep-alive comment interval, so proxies don't drop streams during long LLM calls
+SSE_PING_SECONDS = 15
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame"""
+    return b"data: " + orjson.dumps(payload, option=SSE_JSON_OPTIONS) + b"\n\n"
+
+ANALYZE_STEPS = (
+    "parsing_query",
+    "loading_data",
+    "analyzing_data",
+    "generating_visualizations",
+    "extracting_business_impact",
+)
+
+# Message-only step frames never change, so they are encoded once
+STATIC_STEP_FRAMES = {
+    "parsing_query": sse_event({"step": "parsing_query", "message": "Understanding your question..."}),
+    "loading_data": sse_event({"step": "loading_data", "message": "Loading salesorder.csv data..."}),
+}
+SAMPLE_LOADING_FRAME = sse_event({"step": "loading_data", "message": "Loading sample data..."})
+
 class AnalysisRequest(BaseModel):
     query: str
     data_file: Optional[str] = None
@@ -81,17 +245,20 @@ async def root():
 @app.get("/api/data-info")
 async def get_data_info():
     """Get information about loaded data"""
+    global _data_info_body
     if loaded_data is None:
         return {"error": "No data loaded"}
     
-    # Replace NaN values with None for JSON serialization
-    sample_data = loaded_data.head(5).fillna(0).to_dict('records')
+    # The payload only changes on load/upload, so encode it once and reuse it;
+    # orjson writes NaN as null, so the sample needs no fillna pass
+    if _data_info_body is None:
+        _data_info_body = orjson.dumps({
+            "loaded": True,
+            "stats": data_stats,
+            "sample": loaded_data.head(5).to_dict('records')
+        }, option=SSE_JSON_OPTIONS)
     
-    return {
-        "loaded": True,
-        "stats": data_stats,
-        "sample": sample_data
-    }
+    return Response(content=_data_info_body, media_type="application/json")
 
 @app.post("/api/analyze")
 async def analyze_data(request: AnalysisRequest):
@@ -101,47 +268,35 @@ async def analyze_data(request: AnalysisRequest):
             # Use actual data if loaded
             use_real_data = loaded_data is not None
             
-            steps = [
-                {"step": "parsing_query", "message": "Understanding your question..."},
-                {"step": "loading_data", "message": "Loading salesorder.csv data..." if use_real_data else "Loading sample data..."},
-                {"step": "analyzing_data", "message": "Analyzing patterns..."},
-                {"step": "generating_visualizations", "message": "Creating visualizations..."},
-                {"step": "extracting_business_impact", "message": "Extracting insights..."},
-            ]
-            
-            for step in steps:
-                await asyncio.sleep(0.5)
+            for step in ANALYZE_STEPS:
+                await asyncio.sleep(STEP_PACING_SECONDS)
                 
-                if step["step"] == "analyzing_data":
-                    analysis = await perform_analysis_with_data(request.query)
-                    yield f"data: {json.dumps({'step': step['step'], 'analysis': analysis})}\n\n"
-                elif step["step"] == "generating_visualizations":
-                    visualizations = generate_visualizations_from_data(request.query)
+                if step == "analyzing_data":
+                    analysis = await asyncio.to_thread(perform_analysis_with_data, request.query)
+                    yield sse_event({'step': step, 'analysis': analysis})
+                elif step == "generating_visualizations":
+                    visualizations = await asyncio.to_thread(generate_visualizations_from_data, request.query)
                     print(f"[STREAMING] About to send {len(visualizations)} visualizations to frontend")
-                    stream_data = {'step': step['step'], 'visualizations': visualizations}
-                    stream_json = json.dumps(stream_data)
-                    print(f"[STREAMING] JSON size: {len(stream_json)} bytes")
-                    yield f"data: {stream_json}\n\n"
-                elif step["step"] == "extracting_business_impact":
+                    frame = sse_event({'step': step, 'visualizations': visualizations})
+                    print(f"[STREAMING] Frame size: {len(frame)} bytes")
+                    yield frame
+                elif step == "extracting_business_impact":
                     # Skip business impact, just send recommendations
-                    recommendations = generate_recommendations_from_data(request.query)
-                    yield f"data: {json.dumps({'step': step['step'], 'recommendations': recommendations})}\n\n"
+                    recommendations = await asyncio.to_thread(generate_recommendations_from_data, request.query)
+                    yield sse_event({'step': step, 'recommendations': recommendations})
+                elif step == "loading_data" and not use_real_data:
+                    yield SAMPLE_LOADING_FRAME
                 else:
-                    yield f"data: {json.dumps(step)}\n\n"
+                    yield STATIC_STEP_FRAMES[step]
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no"
-            }
-        )
+        # Frames are already-encoded bytes, which EventSourceResponse passes
+        # through; it adds keep-alive pings and the no-cache/no-buffering headers
+        return EventSourceResponse(generate(), ping=SSE_PING_SECONDS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def perform_analysis_with_data(query: str):
-    """Analyze using actual data"""
+def perform_analysis_with_data(query: str):
+    """Analyze using actual data (blocking; called via asyncio.to_thread)"""
     global loaded_data
     
     if loaded_data is not None:
@@ -170,19 +325,27 @@ async def perform_analysis_with_data(query: str):
                 "min": float(loaded_data[col].min())
             }
         
-        # Use OpenAI to generate insights
+        # Use OpenAI to generate insights; repeat questions on the same data reuse the answer
+        cache_key = (" ".join(query.lower().split()), _data_version)
         try:
-            data_context = f"Data has {len(loaded_data)} rows, columns: {', '.join(loaded_data.columns[:10])}. Sample stats: {stats}"
-            
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a data analyst. Analyze the data and provide insights."},
-                    {"role": "user", "content": f"Query: {query}\n\nData context: {data_context}"}
-                ],
-                max_tokens=300
-            )
-            summary = response.choices[0].message.content
+            summary = _analysis_cache.get(cache_key)
+            if summary is None:
+                data_context = f"Data has {len(loaded_data)} rows, columns: {', '.join(loaded_data.columns[:10])}. Sample stats: {stats}"
+                
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": "You are a data analyst. Analyze the data and provide insights."},
+                        {"role": "user", "content": f"Query: {query}\n\nData context: {data_context}"}
+                    ],
+                    max_tokens=300
+                )
+                summary = response.choices[0].message.content
+                _analysis_cache[cache_key] = summary
+                if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                    _analysis_cache.popitem(last=False)
+            else:
+                _analysis_cache.move_to_end(cache_key)
         except:
             summary = f"Analyzed {len(loaded_data)} sales orders. The data contains {len(loaded_data.columns)} columns including order details, customer information, and financial metrics."
         
@@ -213,7 +376,7 @@ def generate_visualizations_from_data(query: str):
     
     if loaded_data is not None:
         # First try to get query-specific visualizations
-        from intelligent_query_processor import process_data_query
+        from intelligent_query_processor import process_data_query, clean_visualization_data
         query_result = process_data_query(query, loaded_data)
         
         # Handle both single and multiple visualizations
@@ -227,75 +390,15 @@ def generate_visualizations_from_data(query: str):
         # Convert any non-serializable objects to strings
         for viz in visualizations:
             if 'data' in viz:
-                for item in viz['data']:
-                    for key, value in item.items():
-                        # Convert Timestamp, Period, or other non-serializable types to string
-                        if hasattr(value, 'isoformat'):
-                            item[key] = value.isoformat()
-                        elif not isinstance(value, (str, int, float, bool, type(None))):
-                            item[key] = str(value)
+                viz['data'] = clean_visualization_data(viz['data'])
         
         # Return all visualizations if we have any
         if visualizations:
             print(f"Returning {len(visualizations)} visualizations from query")
             return visualizations
         
-        # Default visualizations if no query-specific ones
-        # Generate real visualizations from your sales data
-        
-        # 1. Top customers by totalamount
-        if 'customeridname' in loaded_data.columns and 'totalamount' in loaded_data.columns:
-            # Filter out null values and get top customers
-            customer_data = loaded_data[loaded_data['customeridname'].notna() & loaded_data['totalamount'].notna()]
-            top_customers = customer_data.groupby('customeridname')['totalamount'].sum().nlargest(5)
-            
-            visualizations.append({
-                "type": "bar",
-                "title": "Top Customer Revenue Distribution",
-                "description": "Shows revenue concentration among top customers to identify key accounts",
-                "data": [
-                    {"name": str(name)[:30] if len(str(name)) > 30 else str(name), 
-                     "value": float(value)}
-                    for name, value in top_customers.items()
-                ],
-                "config": {"xAxis": "name", "yAxis": "value", "color": "#818CF8"}
-            })
-        
-        # 2. Order status distribution
-        if 'statuscode' in loaded_data.columns:
-            status_counts = loaded_data['statuscode'].value_counts().head(5)
-            status_map = {1: 'Active', 2: 'Submitted', 3: 'Canceled', 4: 'Fulfilled', 100: 'Invoiced'}
-            
-            visualizations.append({
-                "type": "bar",
-                "title": "Order Status Distribution",
-                "description": "Distribution of order statuses",
-                "data": [
-                    {"name": status_map.get(int(status), f"Status {status}"), 
-                     "value": int(count)}
-                    for status, count in status_counts.items()
-                ],
-                "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
-            })
-        
-        # Add numeric column distribution
-        numeric_cols = loaded_data.select_dtypes(include=[np.number]).columns[:2]
-        for col in numeric_cols:
-            if col in loaded_data.columns:
-                # Create histogram data
-                hist, bins = np.histogram(loaded_data[col].dropna(), bins=5)
-                
-                visualizations.append({
-                    "type": "bar",
-                    "title": f"{col} Distribution",
-                    "description": f"Distribution of {col} values",
-                    "data": [
-                        {"name": f"{bins[i]:.0f}-{bins[i+1]:.0f}", "value": int(hist[i])}
-                        for i in range(len(hist))
-                    ],
-                    "config": {"xAxis": "name", "yAxis": "value", "color": "#A78BFA"}
-                })
-                break
+        # Fall back to the default charts, which are built once per load
+        visualizations.extend(_default_visualizations)
     
     # Fallback to default if no data
     if not visualizations:
@@ -326,26 +429,31 @@ def generate_business_impact_from_data(query: str):
         
         # Analyze customer concentration
         if 'customeridname' in loaded_data.columns and 'totalamount' in loaded_data.columns:
-            customer_data = loaded_data[loaded_data['customeridname'].notna() & loaded_data['totalamount'].notna()]
-            top_5_customers = customer_data.groupby('customeridname')['totalamount'].sum().nlargest(5)
-            total_revenue = customer_data['totalamount'].sum()
-            top_5_revenue_pct = (top_5_customers.sum() / total_revenue * 100) if total_revenue > 0 else 0
+            # One grouped pass: null customers are dropped by groupby, and
+            # min_count=1 keeps customers with no amounts out of the top list
+            customer_revenue = loaded_data.groupby('customeridname', sort=False, observed=True)['totalamount'].sum(min_count=1)
+            top_5_customers = customer_revenue.nlargest(5)
+            # Pull names and amounts out once as plain arrays
+            top_names = top_5_customers.index.to_numpy()
+            top_amounts = top_5_customers.to_numpy()
+            total_revenue = customer_revenue.sum()
+            top_5_revenue_pct = (top_amounts.sum() / total_revenue * 100) if total_revenue > 0 else 0
             
             if top_5_revenue_pct > 20:
                 points.append(f"Top 5 customers represent {top_5_revenue_pct:.1f}% of total revenue - high customer concentration risk")
             
             # Specific customer insights
-            top_customer = top_5_customers.index[0] if len(top_5_customers) > 0 else "Unknown"
-            top_customer_pct = (top_5_customers.iloc[0] / total_revenue * 100) if len(top_5_customers) > 0 and total_revenue > 0 else 0
+            top_customer = top_names[0] if len(top_names) > 0 else "Unknown"
+            top_customer_pct = (top_amounts[0] / total_revenue * 100) if len(top_amounts) > 0 and total_revenue > 0 else 0
             if top_customer_pct > 10:
                 points.append(f"{top_customer} alone accounts for {top_customer_pct:.1f}% of revenue - critical account to retain")
         
         # Analyze order fulfillment
         if 'statuscode' in loaded_data.columns:
-            status_counts = loaded_data['statuscode'].value_counts()
+            canceled_orders = int((loaded_data['statuscode'].to_numpy() == 3).sum())  # Canceled status
             total_orders = len(loaded_data)
-            if 3 in status_counts:  # Canceled status
-                cancel_rate = status_counts[3] / total_orders * 100
+            if canceled_orders:
+                cancel_rate = canceled_orders / total_orders * 100
                 if cancel_rate > 5:
                     points.append(f"Order cancellation rate of {cancel_rate:.1f}% needs investigation to reduce revenue loss")
         
@@ -374,6 +482,66 @@ def generate_business_impact_from_data(query: str):
         ]
     }
 
+# (topic, keywords) in priority order; a keyword anywhere in the query selects its topic
+_RECOMMENDATION_TOPICS = (
+    ("customer", ("customer", "client", "buyer")),
+    ("revenue", ("revenue", "sales", "amount", "value")),
+    ("order", ("order", "status", "fulfillment")),
+    ("product", ("product", "item", "sku")),
+    ("time", ("trend", "monthly", "yearly", "time", "date")),
+)
+
+_TOPIC_RANK = {word: rank for rank, (_, words) in enumerate(_RECOMMENDATION_TOPICS) for word in words}
+
+# One scan for every keyword; the lookahead also reports overlapping hits
+_TOPIC_KEYWORD_RE = re.compile("(?=(" + "|".join(sorted(_TOPIC_RANK, key=len, reverse=True)) + "))")
+
+TOPIC_RECOMMENDATIONS = {
+    "customer": (
+        "Focus retention efforts on high-value customers",
+        "Analyze customer purchase patterns for upselling opportunities",
+        "Segment customers by value for targeted marketing",
+        "Monitor customer churn indicators"
+    ),
+    "revenue": (
+        "Identify seasonal trends in revenue patterns",
+        "Analyze product mix contribution to revenue",
+        "Focus on high-margin products and services",
+        "Optimize pricing strategies based on sales data"
+    ),
+    "order": (
+        "Optimize order processing workflow",
+        "Reduce order cancellation rates",
+        "Improve fulfillment time metrics",
+        "Implement automated status tracking"
+    ),
+    "product": (
+        "Analyze product performance by region",
+        "Identify slow-moving inventory",
+        "Optimize product bundling strategies",
+        "Review product profitability margins"
+    ),
+    "time": (
+        "Implement predictive analytics for forecasting",
+        "Identify cyclical patterns in the data",
+        "Set up automated trend monitoring",
+        "Compare year-over-year performance metrics"
+    ),
+}
+
+# Customer questions about owners get owner-focused advice instead
+OWNER_RECOMMENDATIONS = (
+    "Analyze owner performance metrics to identify top performers",
+    "Consider implementing owner-based sales incentives",
+    "Review owner assignment distribution for workload balance",
+    "Track owner conversion rates and customer satisfaction"
+)
+
+def match_recommendation_topic(query: str) -> Optional[str]:
+    """Return the highest-priority topic whose keywords appear in the query"""
+    ranks = [_TOPIC_RANK[m.group(1)] for m in _TOPIC_KEYWORD_RE.finditer(query.lower())]
+    return _RECOMMENDATION_TOPICS[min(ranks)][0] if ranks else None
+
 def generate_recommendations_from_data(query: str):
     """Generate recommendations from actual data"""
     global loaded_data
@@ -391,71 +559,21 @@ def generate_recommendations_from_data(query: str):
                 return query_result["recommendations"][:4]
             
             # Generate context-aware recommendations based on the query
-            recommendations = []
-            query_lower = query.lower()
-            
-            # Customer-related queries
-            if any(word in query_lower for word in ['customer', 'client', 'buyer']):
-                if 'owner' in query_lower or 'ownerid' in query_lower:
-                    recommendations.extend([
-                        "Analyze owner performance metrics to identify top performers",
-                        "Consider implementing owner-based sales incentives",
-                        "Review owner assignment distribution for workload balance",
-                        "Track owner conversion rates and customer satisfaction"
-                    ])
-                else:
-                    recommendations.extend([
-                        "Focus retention efforts on high-value customers",
-                        "Analyze customer purchase patterns for upselling opportunities",
-                        "Segment customers by value for targeted marketing",
-                        "Monitor customer churn indicators"
-                    ])
-            
-            # Revenue/sales queries
-            elif any(word in query_lower for word in ['revenue', 'sales', 'amount', 'value']):
-                recommendations.extend([
-                    "Identify seasonal trends in revenue patterns",
-                    "Analyze product mix contribution to revenue",
-                    "Focus on high-margin products and services",
-                    "Optimize pricing strategies based on sales data"
-                ])
-            
-            # Order/status queries
-            elif any(word in query_lower for word in ['order', 'status', 'fulfillment']):
-                recommendations.extend([
-                    "Optimize order processing workflow",
-                    "Reduce order cancellation rates",
-                    "Improve fulfillment time metrics",
-                    "Implement automated status tracking"
-                ])
-            
-            # Product queries
-            elif any(word in query_lower for word in ['product', 'item', 'sku']):
-                recommendations.extend([
-                    "Analyze product performance by region",
-                    "Identify slow-moving inventory",
-                    "Optimize product bundling strategies",
-                    "Review product profitability margins"
-                ])
-            
-            # Time-based queries
-            elif any(word in query_lower for word in ['trend', 'monthly', 'yearly', 'time', 'date']):
-                recommendations.extend([
-                    "Implement predictive analytics for forecasting",
-                    "Identify cyclical patterns in the data",
-                    "Set up automated trend monitoring",
-                    "Compare year-over-year performance metrics"
-                ])
+            topic = match_recommendation_topic(query)
+            if topic == "customer" and 'owner' in query.lower():
+                recommendations = list(OWNER_RECOMMENDATIONS)
+            elif topic:
+                recommendations = list(TOPIC_RECOMMENDATIONS[topic])
             
             # Default intelligent recommendations based on data
             else:
                 numeric_cols = loaded_data.select_dtypes(include=[np.number]).columns
-                recommendations.extend([
+                recommendations = [
                     f"Explore relationships between {len(numeric_cols)} numeric variables",
                     "Use clustering to identify natural groupings in data",
                     "Implement anomaly detection for quality control",
                     "Create predictive models for business forecasting"
-                ])
+                ]
             
             return recommendations[:4]
             
@@ -483,24 +601,33 @@ async def upload_csv(file: UploadFile = File(...)):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
-    contents = await file.read()
-    file_size = len(contents) / (1024 * 1024)
-    
-    if file_size > 1000:
-        raise HTTPException(status_code=400, detail="File size exceeds 1000MB limit")
+    size_error = HTTPException(status_code=400, detail="File size exceeds 1000MB limit")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise size_error
     
+    # Stream to disk in 1 MiB chunks instead of buffering the whole upload
     file_path = Path(f"./data/uploads/{file.filename}")
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > MAX_UPLOAD_BYTES:
+                break
+            await f.write(chunk)
+    
+    if file_size > MAX_UPLOAD_BYTES:
+        file_path.unlink(missing_ok=True)
+        raise size_error
     
     # Load the new file
     try:
-        loaded_data = pd.read_csv(file_path, nrows=100000)  # Load first 100k rows
+        loaded_data = await asyncio.to_thread(parse_csv, file_path)
         data_stats = {
             "total_rows": len(loaded_data),
             "columns": loaded_data.columns.tolist(),
             "dtypes": {col: str(dtype) for col, dtype in loaded_data.dtypes.items()}
         }
+        await asyncio.to_thread(invalidate_stats)
         
         return {
             "filename": file.filename,
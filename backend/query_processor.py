@@ -1,131 +1,352 @@
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable
 
-def process_data_query(query: str, data: pd.DataFrame) -> Dict[str, Any]:
+# Customer revenue ranking done inside SQLite so only the n result rows come back;
+# ties break on name, matching pandas' nlargest/nsmallest over the sorted groupby.
+# The customer_revenue summary table (built at load time) answers in O(n) rows
+TOP_CUSTOMERS_SQL = """
+    SELECT customeridname, total_revenue
+    FROM customer_revenue
+    ORDER BY total_revenue DESC, customeridname
+    LIMIT ?
+"""
+
+BOTTOM_CUSTOMERS_SQL = """
+    SELECT customeridname, total_revenue
+    FROM customer_revenue
+    WHERE total_revenue > 0
+    ORDER BY total_revenue ASC, customeridname
+    LIMIT ?
+"""
+
+# Fallbacks for databases built before the summary table existed
+TOP_CUSTOMERS_SCAN_SQL = """
+    SELECT customeridname, SUM(totalamount) AS revenue
+    FROM salesorder
+    WHERE customeridname IS NOT NULL AND totalamount IS NOT NULL
+    GROUP BY customeridname
+    ORDER BY revenue DESC, customeridname
+    LIMIT ?
+"""
+
+BOTTOM_CUSTOMERS_SCAN_SQL = """
+    SELECT customeridname, SUM(totalamount) AS revenue
+    FROM salesorder
+    WHERE customeridname IS NOT NULL AND totalamount IS NOT NULL
+    GROUP BY customeridname
+    HAVING revenue > 0
+    ORDER BY revenue ASC, customeridname
+    LIMIT ?
+"""
+
+# Default data source when no frame is passed in: only the columns this module
+# reads, loaded once per process from the bundled SQLite database
+SALESORDER_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "crm_analytics.db")
+SALESORDER_COLUMNS_SQL = "SELECT customeridname, statuscode, totalamount, modifiedon FROM salesorder"
+_salesorder_frame: Optional[pd.DataFrame] = None
+_salesorder_lock = threading.Lock()
+
+def load_salesorder_frame(db_path: str = SALESORDER_DB_PATH) -> pd.DataFrame:
+    """Read the salesorder columns used here, with the low-cardinality ones as categoricals"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        frame = pd.read_sql_query(SALESORDER_COLUMNS_SQL, conn)
+    finally:
+        conn.close()
+    frame['customeridname'] = frame['customeridname'].astype('category')
+    frame['statuscode'] = frame['statuscode'].astype('category')
+    return frame
+
+def get_salesorder_frame() -> pd.DataFrame:
+    """Return the process-wide salesorder frame, loading it on first use"""
+    global _salesorder_frame
+    if _salesorder_frame is None:
+        with _salesorder_lock:
+            if _salesorder_frame is None:
+                _salesorder_frame = load_salesorder_frame()
+    return _salesorder_frame
+
+def rank_customers_sql(conn: sqlite3.Connection, n: int, is_bottom: bool) -> pd.Series:
+    """Return the top (or bottom, non-zero) n customers by revenue from the salesorder table"""
+    try:
+        rows = conn.execute(BOTTOM_CUSTOMERS_SQL if is_bottom else TOP_CUSTOMERS_SQL, (n,)).fetchall()
+    except sqlite3.OperationalError:
+        # No customer_revenue table: aggregate the orders directly
+        rows = conn.execute(BOTTOM_CUSTOMERS_SCAN_SQL if is_bottom else TOP_CUSTOMERS_SCAN_SQL, (n,)).fetchall()
+    return pd.Series(
+        [revenue for _, revenue in rows],
+        index=[customer for customer, _ in rows],
+        dtype=float
+    )
+
+# Group-by results per (frame, aggregate). Entries hold a weak reference to
+# their frame, so a reloaded frame that happens to reuse an id() misses
+AGGREGATE_CACHE_SIZE = 16
+_aggregate_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+# Full query results per (frame, intent); see process_data_query
+ANSWER_CACHE_SIZE = 256
+_answer_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+def _cached_for_frame(cache: OrderedDict, max_size: int, data: pd.DataFrame, name, compute: Callable[[pd.DataFrame], Any]) -> Any:
+    """Return compute(data) from an LRU cache keyed on the frame's identity and name"""
+    key = (id(data), name)
+    entry = cache.get(key)
+    if entry is not None and entry[0]() is data:
+        cache.move_to_end(key)
+        return entry[1]
+    
+    result = compute(data)
+    cache[key] = (weakref.ref(data), result)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+    return result
+
+def cached_aggregate(data: pd.DataFrame, name: str, compute: Callable[[pd.DataFrame], pd.Series]) -> pd.Series:
+    """Return compute(data), reusing the result from earlier calls on the same frame"""
+    return _cached_for_frame(_aggregate_cache, AGGREGATE_CACHE_SIZE, data, name, compute)
+
+def _customer_revenue(data: pd.DataFrame) -> pd.Series:
+    # Factorize once and accumulate with a weighted bincount over the integer
+    # codes; no filtered copy of the frame and no per-group dispatch
+    codes, customers = pd.factorize(data['customeridname'], sort=True)
+    amounts = data['totalamount'].to_numpy(dtype=float, na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(amounts)
+    revenue = np.bincount(codes[valid], weights=amounts[valid], minlength=len(customers))
+    # Customers whose amounts are all missing are left out rather than reported as 0
+    seen = np.bincount(codes[valid], minlength=len(customers)) > 0
+    return pd.Series(
+        revenue[seen],
+        index=pd.Index(customers[seen], name='customeridname'),
+        name='totalamount'
+    )
+
+STATUS_NAMES = {1: 'Active', 2: 'Submitted', 3: 'Canceled', 4: 'Fulfilled', 100: 'Invoiced'}
+
+def status_label(status) -> str:
+    """Display name for a salesorder statuscode"""
+    return STATUS_NAMES.get(int(status), f"Status {status}")
+
+def _status_revenue(data: pd.DataFrame) -> pd.Series:
+    # observed=True: a categorical statuscode only lists codes that actually occur
+    revenue = data.groupby('statuscode', observed=True)['totalamount'].sum()
+    # Labelled here, so cached results carry display names and callers never map codes
+    return revenue.rename(index=status_label)
+
+def _status_counts(data: pd.DataFrame) -> pd.Series:
+    counts = data['statuscode'].value_counts()
+    # Categorical columns also report unused categories with a zero count
+    counts = counts[counts > 0]
+    labels = pd.Index([status_label(status) for status in counts.index.tolist()], dtype=object)
+    return pd.Series(counts.to_numpy(), index=labels, name='count')
+
+def _monthly_revenue(data: pd.DataFrame) -> pd.Series:
+    # ISO8601 skips per-value format inference and cache=True parses each
+    # distinct timestamp string once
+    column = data['modifiedon']
+    stamps = pd.to_datetime(column, errors='coerce', format='ISO8601', cache=True)
+    if stamps.isna().sum() > column.isna().sum():
+        # Some values are not ISO8601 (e.g. '1/15/2024 10:00 AM' from a raw CRM
+        # export); re-parse with the format inferred from the data and keep
+        # whichever parse recovered more timestamps
+        inferred = pd.to_datetime(column, errors='coerce', cache=True)
+        if inferred.notna().sum() > stamps.notna().sum():
+            stamps = inferred
+    if stamps.dt.tz is not None:
+        stamps = stamps.dt.tz_localize(None)  # bucket on wall-clock month, as to_period did
+    # Truncating to datetime64[M] is integer math, with no PeriodIndex to build
+    months = stamps.to_numpy().astype('datetime64[M]')
+    monthly = data['totalamount'].groupby(months).sum()
+    monthly.index = pd.Index(np.datetime_as_string(monthly.index.to_numpy(), unit='M'), name='month')
+    return monthly
+
+def select_extreme(series: pd.Series, n: int, largest: bool = True) -> pd.Series:
+    """nlargest/nsmallest (keep='first') via a linear-time partition, sorting only the winners"""
+    if n <= 0:
+        return series.iloc[:0]
+    keys = -series.to_numpy(dtype=float) if largest else series.to_numpy(dtype=float)
+    if n < len(keys):
+        # Everything at or past the n-th key, ties included, in original order
+        cutoff = np.partition(keys, n - 1)[n - 1]
+        candidates = np.flatnonzero(keys <= cutoff)
+    else:
+        candidates = np.arange(len(keys))
+    # A stable sort keeps earlier rows first among equal values, as keep='first' does
+    order = candidates[np.argsort(keys[candidates], kind='stable')][:n]
+    return series.iloc[order]
+
+# Every intent keyword found in one pass; the lookahead also reports keywords that
+# overlap (e.g. "customerevenue"), so this matches plain substring checks exactly
+_INTENT_KEYWORD_RE = re.compile(r'(?=(top|bottom|lowest|highest|customer|revenue|status|monthly|trend|order|count|how many))')
+RANKING_KEYWORDS = frozenset({"top", "bottom", "lowest", "highest"})
+BOTTOM_KEYWORDS = frozenset({"bottom", "lowest"})
+TREND_KEYWORDS = frozenset({"monthly", "trend"})
+COUNT_KEYWORDS = frozenset({"count", "how many"})
+_NUMBER_RE = re.compile(r'\d+')
+
+def chart_points(names: List[str], values: pd.Series) -> List[Dict[str, Any]]:
+    """Pair chart labels with a series' values, unboxed to Python floats in one call"""
+    return [{"name": name, "value": value} for name, value in zip(names, values.to_numpy(dtype=float).tolist())]
+
+def process_data_query(query: str, data: Optional[pd.DataFrame] = None, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
     """
     Process natural language queries and return actual data results
+
+    Without a frame, the process-wide salesorder frame is used, so callers no
+    longer need to keep their own copy. When a SQLite connection is given,
+    customer rankings are computed in the database instead of over the frame.
     """
-    query_lower = query.lower()
+    if data is None:
+        data = get_salesorder_frame()
+    intent = query_intent(query)
+    if conn is not None:
+        return answer_query(intent, data, conn)
+    # The answer depends only on the intent, so paraphrases ("top 5 customers",
+    # "show me the top 5 customers by revenue") share one cached result per frame
+    return _cached_for_frame(
+        _answer_cache, ANSWER_CACHE_SIZE, data, intent,
+        lambda frame: answer_query(intent, frame)
+    )
+
+def query_intent(query: str) -> tuple:
+    """Reduce a query to the intent that decides its answer: (kind, *parameters)"""
+    keywords = set(_INTENT_KEYWORD_RE.findall(query.lower()))
+    if keywords & RANKING_KEYWORDS and "customer" in keywords:
+        # Extract the first number (default to 10)
+        number = _NUMBER_RE.search(query)
+        n = int(number.group()) if number else 10
+        return ("customers", n, bool(keywords & BOTTOM_KEYWORDS))
+    if "revenue" in keywords and "status" in keywords:
+        return ("status_revenue",)
+    if keywords & TREND_KEYWORDS:
+        return ("monthly_trend",)
+    if "order" in keywords and keywords & COUNT_KEYWORDS:
+        return ("order_stats",)
+    return ("overview",)
+
+def answer_query(intent: tuple, data: pd.DataFrame, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    """Build the answer for an intent from query_intent()"""
+    kind = intent[0]
     
     # Top/Bottom customers query
-    if ("top" in query_lower or "bottom" in query_lower or "lowest" in query_lower or "highest" in query_lower) and "customer" in query_lower:
-        # Extract number (default to 10)
-        import re
-        numbers = re.findall(r'\d+', query)
-        n = int(numbers[0]) if numbers else 10
-        
-        # Determine if looking for top or bottom
-        is_bottom = "bottom" in query_lower or "lowest" in query_lower
+    if kind == "customers":
+        _, n, is_bottom = intent
         
         # Get customers by revenue
-        if 'customeridname' in data.columns and 'totalamount' in data.columns:
-            customer_data = data[data['customeridname'].notna() & data['totalamount'].notna()]
-            customer_revenue = customer_data.groupby('customeridname')['totalamount'].sum()
-            
-            if is_bottom:
-                # Get bottom customers (excluding zero revenue)
-                customer_revenue = customer_revenue[customer_revenue > 0]  # Exclude zero revenue
-                selected_customers = customer_revenue.nsmallest(n)
-                label = "bottom"
-                title_label = "Bottom"
+        if conn is not None or ('customeridname' in data.columns and 'totalamount' in data.columns):
+            if conn is not None:
+                selected_customers = rank_customers_sql(conn, n, is_bottom)
             else:
-                # Get top customers
-                selected_customers = customer_revenue.nlargest(n)
-                label = "top"
-                title_label = "Top"
+                customer_revenue = cached_aggregate(data, 'customer_revenue', _customer_revenue)
+                
+                if is_bottom:
+                    # Get bottom customers (excluding zero revenue)
+                    customer_revenue = customer_revenue[customer_revenue > 0]  # Exclude zero revenue
+                    selected_customers = select_extreme(customer_revenue, n, largest=False)
+                else:
+                    # Get top customers
+                    selected_customers = select_extreme(customer_revenue, n)
+            
+            label = "bottom" if is_bottom else "top"
+            title_label = "Bottom" if is_bottom else "Top"
             
-            # Format response
-            result_text = f"Here are the {label} {n} customers by revenue:\n\n"
-            for i, (customer, revenue) in enumerate(selected_customers.items(), 1):
-                result_text += f"{i}. {customer}: ${revenue:,.2f}\n"
+            # Format response: collect the lines and join once
+            lines = [f"Here are the {label} {n} customers by revenue:", ""]
+            lines.extend(
+                f"{i}. {customer}: ${revenue:,.2f}"
+                for i, (customer, revenue) in enumerate(selected_customers.items(), 1)
+            )
+            result_text = "\n".join(lines) + "\n"
             
             # Create visualization data
             viz_data = {
                 "type": "bar",
                 "title": f"{title_label} {n} Customers by Revenue",
-                "data": [
-                    {"name": str(customer)[:40], "value": float(revenue)}
-                    for customer, revenue in selected_customers.items()
-                ]
+                "data": chart_points(selected_customers.index.astype(str).str.slice(0, 40).tolist(), selected_customers)
             }
             
+            # Metrics come from the n selected values only, never the full frame
+            revenues = selected_customers.to_numpy(dtype=float)
+            has_rows = len(revenues) > 0
             return {
                 "answer": result_text,
                 "visualization": viz_data,
                 "metrics": {
-                    "total_revenue": float(top_customers.sum()),
-                    "average_revenue": float(top_customers.mean()),
-                    "top_customer": str(top_customers.index[0]),
-                    "top_customer_revenue": float(top_customers.iloc[0])
+                    "total_revenue": float(revenues.sum()),
+                    "average_revenue": float(revenues.mean()) if has_rows else 0.0,
+                    "top_customer": str(selected_customers.index[0]) if has_rows else None,
+                    "top_customer_revenue": float(revenues[0]) if has_rows else 0.0
                 }
             }
     
     # Revenue by status query
-    elif "revenue" in query_lower and "status" in query_lower:
+    elif kind == "status_revenue":
         if 'statuscode' in data.columns and 'totalamount' in data.columns:
-            status_revenue = data.groupby('statuscode')['totalamount'].sum()
-            status_map = {1: 'Active', 2: 'Submitted', 3: 'Canceled', 4: 'Fulfilled', 100: 'Invoiced'}
+            status_revenue = cached_aggregate(data, 'status_revenue', _status_revenue)
+            status_names = status_revenue.index.tolist()
             
-            result_text = "Revenue by Order Status:\n\n"
-            for status, revenue in status_revenue.items():
-                status_name = status_map.get(int(status), f"Status {status}")
-                result_text += f"{status_name}: ${revenue:,.2f}\n"
+            lines = ["Revenue by Order Status:", ""]
+            lines.extend(
+                f"{status_name}: ${revenue:,.2f}"
+                for status_name, revenue in zip(status_names, status_revenue.tolist())
+            )
+            result_text = "\n".join(lines) + "\n"
             
             return {
                 "answer": result_text,
                 "visualization": {
                     "type": "bar",
                     "title": "Revenue by Order Status",
-                    "data": [
-                        {"name": status_map.get(int(status), f"Status {status}"), 
-                         "value": float(revenue)}
-                        for status, revenue in status_revenue.items()
-                    ]
+                    "data": chart_points(status_names, status_revenue)
                 }
             }
     
     # Monthly revenue trend
-    elif "monthly" in query_lower or "trend" in query_lower:
+    elif kind == "monthly_trend":
         if 'modifiedon' in data.columns and 'totalamount' in data.columns:
-            # Convert to datetime
-            data['month'] = pd.to_datetime(data['modifiedon'], errors='coerce').dt.to_period('M')
-            monthly_revenue = data.groupby('month')['totalamount'].sum()
+            # Months are derived on the side rather than written back into the shared frame
+            monthly_revenue = cached_aggregate(data, 'monthly_revenue', _monthly_revenue)
+            recent = monthly_revenue.tail(12)
             
-            result_text = "Monthly Revenue Trend:\n\n"
-            for month, revenue in monthly_revenue.tail(12).items():
-                result_text += f"{month}: ${revenue:,.2f}\n"
+            lines = ["Monthly Revenue Trend:", ""]
+            lines.extend(f"{month}: ${revenue:,.2f}" for month, revenue in recent.items())
+            result_text = "\n".join(lines) + "\n"
             
             return {
                 "answer": result_text,
                 "visualization": {
                     "type": "line",
                     "title": "Monthly Revenue Trend",
-                    "data": [
-                        {"name": str(month), "value": float(revenue)}
-                        for month, revenue in monthly_revenue.tail(12).items()
-                    ]
+                    "data": chart_points(recent.index.astype(str).tolist(), recent)
                 }
             }
     
     # Order statistics
-    elif "order" in query_lower and ("count" in query_lower or "how many" in query_lower):
+    elif kind == "order_stats":
         total_orders = len(data)
         avg_order_value = data['totalamount'].mean() if 'totalamount' in data.columns else 0
         
-        result_text = f"Order Statistics:\n\n"
-        result_text += f"Total Orders: {total_orders:,}\n"
-        result_text += f"Average Order Value: ${avg_order_value:,.2f}\n"
+        lines = [
+            "Order Statistics:",
+            "",
+            f"Total Orders: {total_orders:,}",
+            f"Average Order Value: ${avg_order_value:,.2f}",
+        ]
         
         if 'statuscode' in data.columns:
-            status_counts = data['statuscode'].value_counts()
-            result_text += "\nOrders by Status:\n"
-            status_map = {1: 'Active', 2: 'Submitted', 3: 'Canceled', 4: 'Fulfilled', 100: 'Invoiced'}
-            for status, count in status_counts.items():
-                status_name = status_map.get(int(status), f"Status {status}")
-                result_text += f"  {status_name}: {count:,}\n"
+            status_counts = cached_aggregate(data, 'status_counts', _status_counts)
+            lines.extend(["", "Orders by Status:"])
+            # One vectorized concat over the labelled counts, largest first
+            lines.extend(("  " + status_counts.index.to_series() + ": " + status_counts.map("{:,}".format)).tolist())
         
-        return {"answer": result_text}
+        return {"answer": "\n".join(lines) + "\n"}
     
     # Default: return general statistics
     else:
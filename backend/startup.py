@@ -7,8 +7,9 @@ import os
 import sys
 import uvicorn
 from pathlib import Path
-from init_sample_database import create_sample_database
-from download_database import download_full_database
+
+# A database at least this large is taken to be the full dataset, not the sample
+FULL_DB_THRESHOLD_MB = int(os.environ.get("STARTUP_DOWNLOAD_THRESHOLD_MB", 400))
 
 def main():
     print("=" * 60)
@@ -39,9 +40,13 @@ def main():
     
     if not db_path.exists():
         print("No database found. Attempting to download full database...")
+        # Imported only on the paths that build or fetch a database, so a normal
+        # restart with the database in place skips loading requests and friends
+        from init_sample_database import create_sample_database
         
         # Try to download full database first
         try:
+            from download_database import download_full_database
             if not download_full_database():
                 # If download fails, create sample database
                 print("Download failed. Creating sample database as fallback...")
@@ -58,8 +63,8 @@ def main():
         if download_marker.exists():
             print("✓ Full database marker found - skipping re-download")
             print(f"✓ Using existing database ({file_size / 1024 / 1024:.2f} MB)")
-        # Check if this is the full database (>400MB)
-        elif file_size > 400 * 1024 * 1024:  # 400MB threshold for full database
+        # Check if this is the full database
+        elif file_size > FULL_DB_THRESHOLD_MB * 1024 * 1024:
             print("✓ Full database already loaded from persistent volume!")
             print(f"✓ Contains all 1.4M+ records ({file_size / 1024 / 1024:.2f} MB)")
             print("✓ Skipping re-download - database is complete")
@@ -68,6 +73,7 @@ def main():
         # Only re-download if it's a small/sample database and we have a URL
         elif file_size < 10 * 1024 * 1024 and os.environ.get('DATABASE_URL'):
             print("Small database detected. Attempting to download full database...")
+            from download_database import download_full_database
             if download_full_database():
                 print("✓ Full database downloaded successfully!")
                 print("✓ Database is now persistent in Railway volume")
@@ -82,13 +88,21 @@ def main():
     # Get port from environment or use default
     port = int(os.environ.get("PORT", 8000))
     
-    print(f"Starting server on port {port}...")
+    # Each worker is a separate process with its own SQLite connections and
+    # caches; the data itself stays in the database, so workers are cheap
+    workers = int(os.environ.get("WEB_CONCURRENCY", min(4, os.cpu_count() or 1)))
+    
+    print(f"Starting server on port {port} with {workers} worker(s)...")
     
-    # Start the server
+    # Start the server; uvicorn[standard] brings uvloop and httptools, which
+    # the "auto" loop/http settings pick up whenever they are installed
     uvicorn.run(
         "main_unified:app",
         host="0.0.0.0",
         port=port,
+        workers=workers,
+        loop="auto",
+        http="auto",
         log_level="info"
     )
 
@@ -0,0 +1,67 @@
+"""
+Checks for the query result cache in main_multi_csv.py
+Run with: python test_multi_csv_cache.py (or pytest)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import intelligent_query_processor
+import main_multi_csv
+
+SALES = pd.DataFrame({
+    "customeridname": ["Addison LLC", "Voit Company", "Addison LLC"],
+    "totalamount": [100.0, 250.0, 50.0],
+})
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, counting calls"""
+    def __init__(self, code=None):
+        self.code = code
+        self.calls = 0
+    
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.code is None:
+            raise RuntimeError("OpenAI unavailable")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.code))])
+
+def run_query(query):
+    return asyncio.run(main_multi_csv.run_data_query(query, (SALES, "salesorder", "Sales Orders")))
+
+def with_completions(fake):
+    main_multi_csv._query_cache.clear()
+    intelligent_query_processor.client.chat.completions = fake
+
+def test_failed_llm_call_is_not_cached():
+    fake = FakeCompletions()
+    with_completions(fake)
+    
+    first = run_query("top customers by revenue")
+    second = run_query("top customers by revenue")
+    
+    assert first.get("fallback") and second.get("fallback")
+    assert fake.calls == 2, "a fallback answer was served from the cache"
+    assert not main_multi_csv._query_cache
+
+def test_real_result_is_cached():
+    fake = FakeCompletions("result = {'answer': 'Voit Company leads', 'visualizations': []}")
+    with_completions(fake)
+    
+    first = run_query("who leads revenue")
+    second = run_query("who leads revenue")
+    
+    assert first["answer"] == second["answer"] == "Voit Company leads"
+    assert fake.calls == 1
+
+if __name__ == "__main__":
+    test_failed_llm_call_is_not_cached()
+    test_real_result_is_cached()
+    print("main_multi_csv cache checks passed")
@@ -0,0 +1,50 @@
+"""
+Checks for the chart helpers in langgraph/nodes/visualizer_node.py
+Run with: python test_visualizer_node.py (or pytest)
+"""
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Load the node module on its own; importing the nodes package pulls in every node
+_spec = importlib.util.spec_from_file_location(
+    "visualizer_node", Path(__file__).parent / "langgraph" / "nodes" / "visualizer_node.py"
+)
+visualizer_node = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(visualizer_node)
+
+def test_uniform_histogram_matches_numpy():
+    """Counts and edges agree with np.histogram, including values on bin edges"""
+    rng = np.random.default_rng(0)
+    for case in range(2000):
+        size = int(rng.integers(1, 200))
+        values = rng.integers(-50, 50, size=size).astype(np.float64) * rng.choice([1, 0.1, 7, 1000])
+        bins = int(rng.integers(1, 20))
+        counts, edges = visualizer_node._uniform_histogram(values, bins)
+        expected_counts, expected_edges = np.histogram(values, bins=bins)
+        assert counts == expected_counts.tolist(), (case, values.tolist(), bins)
+        assert np.array_equal(edges, expected_edges), case
+
+def test_uniform_histogram_empty_and_constant():
+    for values in (np.array([]), np.array([3.0, 3.0, 3.0])):
+        counts, edges = visualizer_node._uniform_histogram(values, 10)
+        expected_counts, expected_edges = np.histogram(values, bins=10)
+        assert counts == expected_counts.tolist()
+        assert np.array_equal(edges, expected_edges)
+
+def test_top_n_sums_ties_match_series_nlargest():
+    """Tied sums come back in the same order as groupby().sum().nlargest()"""
+    df = pd.DataFrame({
+        "customer_id": ["d", "b", "e", "a", "c", "f", "b"],
+        "revenue": [5.0, 2.0, 5.0, 5.0, 5.0, 1.0, 3.0],
+    })
+    expected = df.groupby("customer_id")["revenue"].sum().nlargest(5)
+    assert visualizer_node._top_n_sums(df, "customer_id", "revenue") == list(expected.items())
+
+if __name__ == "__main__":
+    test_uniform_histogram_matches_numpy()
+    test_uniform_histogram_empty_and_constant()
+    test_top_n_sums_ties_match_series_nlargest()
+    print("visualizer_node checks passed")